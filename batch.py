@@ -0,0 +1,218 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from board import *
+from pieces import *
+from engine import Engine
+from perft import move_name
+from pgn import open_games
+
+# Batch analysis
+# A Board is stateful and single-threaded, so a batch is spread over a pool
+# of worker processes instead. Jobs (FEN/EPD lines or PGN games) are sent to
+# the workers in chunks, each worker builds its own Board for every job, and
+# results come back in input order as soon as they are ready.
+
+TASKS = ['evaluate', 'search', 'validate']
+
+# Settings and engine of this worker process, set up by init_worker
+worker = {}
+
+def read_jobs(path):
+    """ Yield the jobs in a file: a Game for each game of a PGN file,
+        otherwise each FEN or EPD line. """
+
+    if path.lower().endswith('.pgn'):
+        for game in open_games(path):
+            yield game
+        return
+
+    with open(path) as positions:
+        for line in positions:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+def init_worker(task, depth, time_limit, hash_mb):
+    """ Set up a worker process for the task. A searching worker keeps one
+        engine, and so one transposition table, for all of its jobs. """
+
+    worker['task'] = task
+    worker['engine'] = None
+
+    if task == 'search':
+        worker['engine'] = Engine(max_depth=depth, time_limit=time_limit, hash_mb=hash_mb)
+
+def job_board(job):
+    """ Return (label, board) for a job. Raise ValueError if the job does
+        not give a position. """
+
+    # PGN games are analyzed at their final position
+    if not isinstance(job, str):
+        return game_label(job), job.replay()
+
+    try:
+        if ';' in job:
+            board, operations = Board.from_epd(job)
+            return operations.get('id', board.to_fen()), board
+        return job, Board.from_fen(job)
+    except (KeyError, IndexError, ValueError, AttributeError):
+        raise ValueError('unreadable position %s' % job)
+
+def game_label(game):
+    """ Return a short name for a game. """
+
+    return '%s vs %s' % (game.headers.get('White', '?'), game.headers.get('Black', '?'))
+
+def check_position(board):
+    """ Raise ValueError if the position could not arise in a game. """
+
+    for pieces, name in [(board.white_pieces, 'white'), (board.black_pieces, 'black')]:
+        kings = [piece for piece in pieces if isinstance(piece, King)]
+        if len(kings) != 1:
+            raise ValueError('%s has %d kings' % (name, len(kings)))
+
+    for file in range(8):
+        if isinstance(board.board[0][file], Pawn) or isinstance(board.board[7][file], Pawn):
+            raise ValueError('pawn on the back rank')
+
+    # The side that just moved cannot have left its king in check
+    if board.white_to_move:
+        king = board.black_king
+    else:
+        king = board.white_king
+    if board.attacked(king.rank, king.file, board.white_to_move):
+        raise ValueError('side not to move is in check')
+
+def analyze(job):
+    """ Run this worker's task on one job and return its result: a dict
+        with the job's label, the position analyzed, any error, and the
+        task's own fields. """
+
+    result = {'label': job if isinstance(job, str) else game_label(job), 'fen': None, 'error': None}
+
+    try:
+        result['label'], board = job_board(job)
+        result['fen'] = board.to_fen()
+
+        # Every task needs both kings on the board
+        check_position(board)
+
+        if worker['task'] == 'validate':
+            result['moves'] = len(board.legal_moves(board.white_to_move))
+            if not isinstance(job, str):
+                result['plies'] = len(job.moves)
+
+        elif worker['task'] == 'evaluate':
+            result['score'] = evaluate(board)
+
+        elif worker['task'] == 'search':
+            engine = worker['engine']
+            best_move, score = engine.search(board)
+            result['move'] = move_name(best_move) if best_move else None
+            result['score'] = score
+            result['depth'] = engine.depth
+            result['nodes'] = engine.nodes
+
+    # One bad job must not end the batch: whatever goes wrong is its result
+    except Exception as exception:
+        result['error'] = str(exception) or type(exception).__name__
+
+    return result
+
+class BatchAnalyzer:
+    """ Runs a task over a stream of jobs on a pool of worker processes and
+        keeps throughput statistics. """
+
+    def __init__(self, task, workers=None, chunksize=8, depth=3, time_limit=None, hash_mb=16):
+        """ Batch analyzer constructor.
+            workers defaults to one per core. Each worker is sent chunksize
+            jobs at a time: larger chunks cost less to dispatch, smaller ones
+            balance uneven jobs (such as searches) better. """
+
+        self.task = task
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.settings = (task, depth, time_limit, hash_mb)
+
+        self.jobs = 0
+        self.errors = 0
+        self.seconds = 0
+
+    def run(self, jobs):
+        """ Yield the result of each job in input order. """
+
+        start = time.perf_counter()
+
+        # A single worker runs here, without the cost of a pool
+        if self.workers == 1:
+            init_worker(*self.settings)
+            results = (analyze(job) for job in jobs)
+            for result in self.count(results, start):
+                yield result
+            return
+
+        with multiprocessing.Pool(self.workers, init_worker, self.settings) as pool:
+            for result in self.count(pool.imap(analyze, jobs, self.chunksize), start):
+                yield result
+
+    def count(self, results, start):
+        """ Yield results, counting them as they pass. """
+
+        for result in results:
+            self.jobs += 1
+            if result['error']:
+                self.errors += 1
+            self.seconds = time.perf_counter() - start
+
+            yield result
+
+    def jobs_per_second(self):
+        """ Return jobs analyzed per second. """
+
+        return self.jobs / max(self.seconds, 1e-9)
+
+def format_result(result):
+    """ Return one line of output for a result. """
+
+    if result['error']:
+        return '%s: error: %s' % (result['label'], result['error'])
+
+    if 'move' in result:
+        return '%s: bestmove %s score %d depth %d nodes %d' % (result['label'], result['move'],
+                                                              result['score'], result['depth'], result['nodes'])
+    if 'score' in result:
+        return '%s: score %d' % (result['label'], result['score'])
+
+    return '%s: ok, %d legal moves' % (result['label'], result['moves'])
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Analyze a file of positions or games on every core.')
+    parser.add_argument('path', help='FEN/EPD file (one position per line) or PGN file')
+    parser.add_argument('--task', choices=TASKS, default='validate', help='what to do with each position')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--chunksize', type=int, default=8, help='jobs sent to a worker at a time')
+    parser.add_argument('--depth', type=int, default=3, help='search depth in plies')
+    parser.add_argument('--time', type=float, default=None, help='search time per position in seconds')
+    parser.add_argument('--hash', type=int, default=16, help='transposition table size per worker in MB')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args(argv)
+
+    analyzer = BatchAnalyzer(args.task, args.workers, args.chunksize, args.depth, args.time, args.hash)
+
+    for result in analyzer.run(read_jobs(args.path)):
+        if not args.quiet:
+            print(format_result(result))
+
+    print('%d jobs, %d errors, %d workers, %.2fs, %.1f jobs/s'
+          % (analyzer.jobs, analyzer.errors, analyzer.workers, analyzer.seconds, analyzer.jobs_per_second()))
+
+    return 1 if analyzer.errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import argparse
+import sys
+import time
+
+from board import *
+from pieces import *
+from perft import POSITIONS, move_name
+
+# Microbenchmarks
+# Times the board operations a search repeats millions of times, one kind
+# of move at a time, so a change to one of them shows up on its own rather
+# than averaged into a perft or search run. Like timeit, each case reports
+# the best of several rounds, which is the least disturbed by the rest of
+# the machine.
+
+ROUNDS = 5
+
+KIWIPETE = POSITIONS[1][1]
+
+# (name, position, move) for each kind of move Board.move handles
+MOVE_CASES = [('quiet', START_FEN, 'g1f3'),
+              ('double push', START_FEN, 'e2e4'),
+              ('capture', KIWIPETE, 'e2a6'),
+              ('en passant', 'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3', 'e5f6'),
+              ('castling', KIWIPETE, 'e1g1'),
+              ('promotion', '1n5k/P7/8/8/8/8/8/K7 w - - 0 1', 'a7a8q')]
+
+# (name, position) for pawn move generation, with and without en passant to look for
+PAWN_CASES = [('pawns', START_FEN),
+              ('pawns, en passant', 'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3')]
+
+def find_move(board, name):
+    """ Return the legal move with the given coordinate name. """
+
+    for move in board.legal_moves(board.white_to_move):
+        if move_name(move) == name:
+            return move
+
+    raise ValueError('no legal move %s' % name)
+
+def best_time(function, repeat):
+    """ Return the seconds per call of the fastest of ROUNDS rounds of
+        repeat calls to function. """
+
+    best = None
+
+    for round in range(ROUNDS):
+        start = time.perf_counter()
+        for i in range(repeat):
+            function()
+        seconds = (time.perf_counter() - start) / repeat
+
+        if best is None or seconds < best:
+            best = seconds
+
+    return best
+
+def time_move(fen, name, repeat):
+    """ Return the seconds one make() and unmove() of a move take. """
+
+    board = Board.from_fen(fen)
+    move = find_move(board, name)
+
+    def make_unmake():
+        board.make(move)
+        board.unmove()
+
+    return best_time(make_unmake, repeat)
+
+def time_pawn_moves(fen, repeat):
+    """ Return the seconds generating the moves of every pawn of the side to move takes. """
+
+    board = Board.from_fen(fen)
+    if board.white_to_move:
+        pawns = [piece for piece in board.white_pieces if isinstance(piece, Pawn)]
+    else:
+        pawns = [piece for piece in board.black_pieces if isinstance(piece, Pawn)]
+
+    def generate():
+        for pawn in pawns:
+            pawn.moves(board)
+
+    return best_time(generate, repeat)
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Time make/unmake and pawn move generation per call.')
+    parser.add_argument('--repeat', type=int, default=10000, help='calls to time in each round')
+    args = parser.parse_args(argv)
+
+    for name, fen, move in MOVE_CASES:
+        print('make/unmake %-20s %8.2f us' % (name, time_move(fen, move, args.repeat) * 1e6))
+
+    for name, fen in PAWN_CASES:
+        print('generate    %-20s %8.2f us' % (name, time_pawn_moves(fen, args.repeat) * 1e6))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import os
+import pickle
+
+# Bitboards
+# A bitboard is a 64-bit integer with one bit per square. Squares are
+# numbered rank * 8 + file using the Board's own indices, so a8 is 0,
+# h8 is 7, a1 is 56, and h1 is 63.
+
+def square(rank, file):
+    """ Return the square number of a rank/file index pair. """
+
+    return rank * 8 + file
+
+def bit(rank, file):
+    """ Return the bitboard holding only the given square. """
+
+    return 1 << (rank * 8 + file)
+
+def lsb(bb):
+    """ Return the number of the lowest set square of a nonempty bitboard. """
+
+    return (bb & -bb).bit_length() - 1
+
+def msb(bb):
+    """ Return the number of the highest set square of a nonempty bitboard. """
+
+    return bb.bit_length() - 1
+
+def count(bb):
+    """ Return the number of squares set in a bitboard. """
+
+    return bin(bb).count('1')
+
+# Bitboards come back as the same handful of attack sets again and again,
+# so the square list for each one is built once and shared.
+# NOTE: Callers must not modify the lists squares() returns.
+SQUARE_LISTS = {}
+
+def squares(bb):
+    """ Return the (rank, file) pairs of the squares set in a bitboard. """
+
+    if bb in SQUARE_LISTS:
+        return SQUARE_LISTS[bb]
+
+    result = []
+    remaining = bb
+
+    while remaining:
+        low = remaining & -remaining
+        index = low.bit_length() - 1
+        result += [(index >> 3, index & 7)]
+        remaining ^= low
+
+    SQUARE_LISTS[bb] = result
+
+    return result
+
+# The same, as square numbers, for building packed moves
+SQUARE_INDEX_LISTS = {}
+
+def square_indices(bb):
+    """ Return the numbers of the squares set in a bitboard. """
+
+    if bb in SQUARE_INDEX_LISTS:
+        return SQUARE_INDEX_LISTS[bb]
+
+    result = []
+    remaining = bb
+
+    while remaining:
+        low = remaining & -remaining
+        result += [low.bit_length() - 1]
+        remaining ^= low
+
+    SQUARE_INDEX_LISTS[bb] = result
+
+    return result
+
+
+# Leaper attack tables
+def leaper_table(steps):
+    """ Return a 64-entry table of the squares reachable from each square
+        by a single step of any of the given (rank, file) offsets. """
+
+    table = []
+
+    for sq in range(64):
+        rank, file = sq >> 3, sq & 7
+        attacks = 0
+
+        for rank_step, file_step in steps:
+            if 0 <= rank + rank_step <= 7 and 0 <= file + file_step <= 7:
+                attacks |= bit(rank + rank_step, file + file_step)
+
+        table += [attacks]
+
+    return table
+
+KNIGHT_ATTACKS = leaper_table([(-2, -1), (-2, 1), (2, -1), (2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2)])
+KING_ATTACKS = leaper_table([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+
+# White pawns advance toward rank index 0, black pawns toward rank index 7.
+WHITE_PAWN_ATTACKS = leaper_table([(-1, -1), (-1, 1)])
+BLACK_PAWN_ATTACKS = leaper_table([(1, -1), (1, 1)])
+
+# Square colors: a8 and h1 are light
+LIGHT_SQUARES = sum(bit(rank, file) for rank in range(8) for file in range(8) if (rank + file) % 2 == 0)
+DARK_SQUARES = LIGHT_SQUARES ^ ((1 << 64) - 1)
+
+
+# Ray masks
+# Directions are (rank, file) steps. The first four run toward higher
+# square numbers, so the nearest blocker along them is the lowest set
+# square; the last four run toward lower square numbers.
+POSITIVE_DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+NEGATIVE_DIRECTIONS = [(-1, 0), (0, -1), (-1, -1), (-1, 1)]
+
+def ray_table(direction):
+    """ Return a 64-entry table of the squares from each square to the
+        edge of the board in the given direction, not including the square itself. """
+
+    table = []
+
+    for sq in range(64):
+        rank, file = (sq >> 3) + direction[0], (sq & 7) + direction[1]
+        ray = 0
+
+        while 0 <= rank <= 7 and 0 <= file <= 7:
+            ray |= bit(rank, file)
+            rank += direction[0]
+            file += direction[1]
+
+        table += [ray]
+
+    return table
+
+RAYS = {direction: ray_table(direction) for direction in POSITIVE_DIRECTIONS + NEGATIVE_DIRECTIONS}
+
+def ray_attacks(sq, occupied, direction):
+    """ Return the squares a slider on sq sees in one direction: every
+        square up to and including the first occupied one. """
+
+    ray = RAYS[direction][sq]
+    blockers = ray & occupied
+
+    if blockers:
+        if direction in POSITIVE_DIRECTIONS:
+            ray ^= RAYS[direction][lsb(blockers)]
+        else:
+            ray ^= RAYS[direction][msb(blockers)]
+
+    return ray
+
+
+# Cached tables
+def load_cached(path, version, build):
+    """ Return the tables build() makes, reading them from the cache file at
+        path if it is present and of the given version, building (and caching)
+        them otherwise. Bump the version when the table layout changes so
+        stale caches are rebuilt. """
+
+    try:
+        with open(path, 'rb') as cache:
+            cached_version, tables = pickle.load(cache)
+        if cached_version == version:
+            return tables
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass
+
+    tables = build()
+
+    # A read-only install simply rebuilds the tables on every import
+    try:
+        with open(path, 'wb') as cache:
+            pickle.dump((version, tables), cache, pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+
+    return tables
@@ -1,5 +1,53 @@
 from pieces import *
-from copy import deepcopy
+from bitboard import *
+from moves import *
+from movepick import *
+from legal import *
+from evaluation import *
+from zobrist import *
+
+# Piece classes by FEN letter and back
+FEN_PIECES = {'P': WhitePawn, 'N': WhiteKnight, 'B': WhiteBishop, 'R': WhiteRook, 'Q': WhiteQueen, 'K': WhiteKing,
+              'p': BlackPawn, 'n': BlackKnight, 'b': BlackBishop, 'r': BlackRook, 'q': BlackQueen, 'k': BlackKing}
+FEN_LETTERS = {piece_class: letter for letter, piece_class in FEN_PIECES.items()}
+
+# En passant target squares a FEN may give, by side to move: the square a
+# pawn of the other side has just passed over
+EN_PASSANT_TARGETS = {True: [file + '6' for file in 'abcdefgh'], False: [file + '3' for file in 'abcdefgh']}
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+def split_operations(text):
+    """ Return the semicolon-terminated operations of an EPD record,
+        leaving semicolons inside quoted operands alone. """
+
+    operations = []
+    current = ''
+    quoted = False
+
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        if char == ';' and not quoted:
+            operations += [current.strip()]
+            current = ''
+        else:
+            current += char
+
+    if current.strip():
+        operations += [current.strip()]
+
+    return operations
+
+def read_epd(path):
+    """ Yield (board, operations) for each record of an EPD file,
+        reading one line at a time. """
+
+    with open(path) as epd:
+        for line in epd:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield Board.from_epd(line)
 
 class Board:
     """ Chess board class. """
@@ -16,8 +64,21 @@ class Board:
         self.ranks = {'1': 7, '2': 6, '3': 5, '4': 4, '5': 3, '6': 2, '7': 1, '8': 0}
         self.files = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4, 'f': 5, 'g': 6, 'h': 7}
 
-        # Initialize a move-ledger.
+        # Initialize a move-ledger and a matching stack of undo records
+        # used by unmove() to take moves back.
         self.moves = []
+        self.undo_stack = []
+
+        # Initialize a cache of legal moves for the present position,
+        # keyed by color. Every move and unmove clears it.
+        self.legal_cache = {}
+
+        # White moves first.
+        self.white_to_move = True
+
+        # Initialize the Zobrist key of piece placement and side to move.
+        # set_square() and move() keep it up to date; see the hash property.
+        self.zobrist = 0
 
         # Grant castling rights to both colors.
         self.white_can_castle = True
@@ -42,13 +103,48 @@ class Board:
         self.num_white_moves = 0
         self.num_black_moves = 0
 
+        # Initialize FEN move counters: plies since the last capture or pawn
+        # move, and the number of the full move in progress.
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+
+        # Initialize the position-key history: the key of the position
+        # before each move in the ledger, pushed by move() and popped by
+        # unmove(), for spotting repetitions.
+        self.hash_history = []
+
+        # Initialize attack maps: for each square, the number of white and
+        # black pieces that attack or defend it and the set of those pieces.
+        # vision_map holds the squares each piece on the board sees.
+        # Board.move keeps all three up to date incrementally.
+        self.white_attacks = [[0] * 8 for i in range(8)]
+        self.black_attacks = [[0] * 8 for i in range(8)]
+        self.attackers = [[set() for j in range(8)] for i in range(8)]
+        self.vision_map = {}
+
+        # Initialize bitboards: one 64-bit integer per piece class plus
+        # occupancy by color, kept in step with self.board by set_square().
+        self.bitboards = {}
+        for piece_class in [WhitePawn, WhiteKnight, WhiteBishop, WhiteRook, WhiteQueen, WhiteKing,
+                            BlackPawn, BlackKnight, BlackBishop, BlackRook, BlackQueen, BlackKing]:
+            self.bitboards[piece_class] = 0
+        self.white_occupied = 0
+        self.black_occupied = 0
+        self.occupied = 0
+
+        # Initialize the running evaluation sums (see evaluation.py), also
+        # kept up to date by set_square().
+        self.middlegame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+
 # Initialize piece
     def init_piece(self, piece, is_white):
         """ Initialize a piece on the chess board.
             NOTE: This method is only called when setting up the board for play. """
 
         # Place the piece in its square.    
-        self.board[piece.rank][piece.file] = piece
+        self.set_square(piece.rank, piece.file, piece)
 
         # Add it to white's pieces or black's pieces.
         if is_white:
@@ -56,33 +152,333 @@ class Board:
         else:
             self.black_pieces += [piece]
 
+        # Add its vision to the attack maps and shorten any rays it blocks.
+        self.update_attacks([(piece.rank, piece.file)], [piece])
+
+    def set_square(self, rank, file, piece):
+        """ Put a piece (or None) on a square of self.board and update
+            the bitboards, Zobrist key, and evaluation sums to match. """
+
+        square_bit = bit(rank, file)
+        sq = rank * 8 + file
+
+        # Take the present occupant off the bitboards and out of the Zobrist key and sums
+        occupant = self.board[rank][file]
+        if occupant:
+            self.middlegame_score -= MIDDLEGAME_SCORES[occupant.code][sq]
+            self.endgame_score -= ENDGAME_SCORES[occupant.code][sq]
+            self.phase -= PHASE_WEIGHTS[occupant.kind]
+            self.zobrist ^= PIECE_KEYS[occupant.__class__][sq]
+            self.bitboards[occupant.__class__] ^= square_bit
+            if occupant.is_white:
+                self.white_occupied ^= square_bit
+            else:
+                self.black_occupied ^= square_bit
+
+        # Put the new piece in them
+        if piece:
+            self.middlegame_score += MIDDLEGAME_SCORES[piece.code][sq]
+            self.endgame_score += ENDGAME_SCORES[piece.code][sq]
+            self.phase += PHASE_WEIGHTS[piece.kind]
+            self.zobrist ^= PIECE_KEYS[piece.__class__][sq]
+            self.bitboards[piece.__class__] ^= square_bit
+            if piece.is_white:
+                self.white_occupied ^= square_bit
+            else:
+                self.black_occupied ^= square_bit
+
+        self.occupied = self.white_occupied | self.black_occupied
+        self.board[rank][file] = piece
+
+
+# FEN
+    @classmethod
+    def from_fen(cls, fen):
+        """ Return a board set up from a FEN string: piece placement, side
+            to move, castling rights, en passant square, and move counters.
+            The move counters may be left off. """
+
+        fields = fen.split()
+        board = cls()
+
+        # Place the pieces, then build the attack maps once for all of them
+        rank = 0
+        for row in fields[0].split('/'):
+            file = 0
+            for char in row:
+                if char.isdigit():
+                    file += int(char)
+                    continue
+
+                piece_class = FEN_PIECES[char]
+                if piece_class in [WhitePawn, BlackPawn]:
+                    piece = piece_class(file)
+                    piece.rank = rank
+                else:
+                    piece = piece_class(rank, file)
+
+                board.set_square(rank, file, piece)
+                if piece.is_white:
+                    board.white_pieces += [piece]
+                else:
+                    board.black_pieces += [piece]
+
+                if char == 'K':
+                    board.white_king = piece
+                if char == 'k':
+                    board.black_king = piece
+
+                file += 1
+            rank += 1
+
+        board.update_attacks([], board.white_pieces + board.black_pieces)
+
+        # Side to move
+        board.white_to_move = fields[1] == 'w'
+        if not board.white_to_move:
+            board.zobrist ^= SIDE_KEY
+
+        # Castling rights belong to the king (can castle at all) and to the
+        # rooks (this corner's rook has not moved)
+        # A right the position cannot honor (the king or that rook is not on
+        # its starting square) is dropped
+        castling = fields[2]
+        board.white_can_castle = False
+        board.black_can_castle = False
+
+        for letter, rank, file, king_class, rook_class in [('K', 7, 7, WhiteKing, WhiteRook), ('Q', 7, 0, WhiteKing, WhiteRook),
+                                                          ('k', 0, 7, BlackKing, BlackRook), ('q', 0, 0, BlackKing, BlackRook)]:
+            if letter not in castling:
+                continue
+            if not isinstance(board.board[rank][4], king_class) or not isinstance(board.board[rank][file], rook_class):
+                continue
+
+            if letter.isupper():
+                board.white_can_castle = True
+                board.white_rooks += [board.board[rank][file]]
+            else:
+                board.black_can_castle = True
+                board.black_rooks += [board.board[rank][file]]
+
+        # En passant is read off the move ledger, so record the double pawn
+        # advance that made it possible. A target square with no such pawn
+        # in front of it is ignored.
+        if fields[3] != '-' and fields[3] in EN_PASSANT_TARGETS[board.white_to_move]:
+            file = board.files[fields[3][0]]
+            if board.white_to_move:
+                pawn, init_rank, end_rank = board.board[3][file], 1, 3
+            else:
+                pawn, init_rank, end_rank = board.board[4][file], 6, 4
+
+            if isinstance(pawn, BlackPawn if board.white_to_move else WhitePawn):
+                board.moves += [[pawn, init_rank, file, end_rank, file, None]]
+
+        # Move counters
+        if len(fields) > 4:
+            board.halfmove_clock = int(fields[4])
+        if len(fields) > 5:
+            board.fullmove_number = int(fields[5])
+
+        return board
+
+    def to_fen(self):
+        """ Return the FEN string of the position. """
+
+        # Piece placement, rank 8 first
+        rows = []
+        for rank in range(8):
+            row = ''
+            empty = 0
+            for file in range(8):
+                piece = self.board[rank][file]
+                if piece:
+                    if empty:
+                        row += str(empty)
+                        empty = 0
+                    row += FEN_LETTERS[piece.__class__]
+                else:
+                    empty += 1
+            if empty:
+                row += str(empty)
+            rows += [row]
+
+        # Castling rights
+        rights = self.castling_rights()
+        castling = ''
+        for right, letter in [(WHITE_KINGSIDE, 'K'), (WHITE_QUEENSIDE, 'Q'), (BLACK_KINGSIDE, 'k'), (BLACK_QUEENSIDE, 'q')]:
+            if rights & right:
+                castling += letter
+
+        # En passant square: the square a pawn that just advanced two squares moved through
+        en_passant = '-'
+        if self.moves:
+            piece, init_rank, init_file, end_rank, end_file, end_piece = self.moves[-1]
+            if piece.kind == PAWN and abs(init_rank - end_rank) == 2:
+                en_passant = 'abcdefgh'[end_file] + str(8 - (init_rank + end_rank) // 2)
+
+        return ' '.join(['/'.join(rows),
+                         'w' if self.white_to_move else 'b',
+                         castling or '-',
+                         en_passant,
+                         str(self.halfmove_clock),
+                         str(self.fullmove_number)])
+
+    @classmethod
+    def from_epd(cls, line):
+        """ Return (board, operations) for a line of EPD: the first four FEN
+            fields followed by semicolon-terminated operations such as
+            bm e4; id "test 1";. Operations map opcode to operand string. """
+
+        fields = line.split(None, 4)
+        board = cls.from_fen(' '.join(fields[:4]))
+
+        operations = {}
+        if len(fields) > 4:
+            for operation in split_operations(fields[4]):
+                parts = operation.split(None, 1)
+                if parts:
+                    operations[parts[0]] = parts[1].strip('"') if len(parts) > 1 else ''
+
+        # EPD carries counters as operations
+        if 'hmvc' in operations:
+            board.halfmove_clock = int(operations['hmvc'])
+        if 'fmvn' in operations:
+            board.fullmove_number = int(operations['fmvn'])
+
+        return board, operations
+
+
+# Position key
+    @property
+    def hash(self):
+        """ Return the 64-bit Zobrist key of the position: piece placement,
+            side to move, castling rights, and en passant file.
+            Placement and side to move are kept up to date incrementally;
+            the castling and en passant parts are read off the board. """
+
+        key = self.zobrist ^ CASTLING_KEYS[self.castling_rights()]
+
+        file = self.en_passant_file()
+        if file is not None:
+            key ^= EN_PASSANT_KEYS[file]
+
+        return key
+
+    def castling_rights(self):
+        """ Return castling rights as a mask of WHITE_KINGSIDE, WHITE_QUEENSIDE,
+            BLACK_KINGSIDE, and BLACK_QUEENSIDE. A side keeps a right while its
+            king and that corner's rook have never moved. """
+
+        rights = 0
+
+        if self.white_can_castle:
+            if self.board[7][7] and self.board[7][7] in self.white_rooks:
+                rights |= WHITE_KINGSIDE
+            if self.board[7][0] and self.board[7][0] in self.white_rooks:
+                rights |= WHITE_QUEENSIDE
+
+        if self.black_can_castle:
+            if self.board[0][7] and self.board[0][7] in self.black_rooks:
+                rights |= BLACK_KINGSIDE
+            if self.board[0][0] and self.board[0][0] in self.black_rooks:
+                rights |= BLACK_QUEENSIDE
+
+        return rights
+
+    def en_passant_file(self):
+        """ Return the file of the pawn that just advanced two squares if a
+            pawn of the side to move can capture it en passant, otherwise None. """
+
+        if not self.moves:
+            return None
+
+        piece, init_rank, init_file, end_rank, end_file, end_piece = self.moves[-1]
+
+        if piece.kind != PAWN or abs(init_rank - end_rank) != 2:
+            return None
+
+        # Squares beside the pawn that advanced
+        beside = 0
+        if end_file > 0:
+            beside |= bit(end_rank, end_file - 1)
+        if end_file < 7:
+            beside |= bit(end_rank, end_file + 1)
+
+        if piece.is_white:
+            capturers = self.bitboards[BlackPawn]
+        else:
+            capturers = self.bitboards[WhitePawn]
+
+        if beside & capturers:
+            return end_file
+
+        return None
+
 
 # Vision
     def white_vision(self):
         """ Return the set of all squares white pieces attack and defend.
             NOTE: This does not include squares directly ahead of pawns. """
 
-        vision = set()
-
-        # Loop through all white pieces and add all squares in those pieces' vision lists.
-        for piece in self.white_pieces:
-            for square in piece.vision(self):
-                vision.add((square[0], square[1]))
-
-        return vision
+        # Read the squares off white's attack counts.
+        return {(rank, file) for rank in range(8) for file in range(8) if self.white_attacks[rank][file]}
 
     def black_vision(self):
-        """ Return the set of all squares white pieces attack and defend.
+        """ Return the set of all squares black pieces attack and defend.
             NOTE: This does not include squares directly ahead of pawns. """
 
-        vision = set()
+        # Read the squares off black's attack counts.
+        return {(rank, file) for rank in range(8) for file in range(8) if self.black_attacks[rank][file]}
+
+    def attacked(self, rank, file, by_white):
+        """ Return boolean value reflecting whether white (by_white True)
+            or black pieces attack the given square. """
+
+        if by_white:
+            return self.white_attacks[rank][file] > 0
+        else:
+            return self.black_attacks[rank][file] > 0
+
+    def update_attacks(self, changed, pieces):
+        """ Bring attack counts up to date after the occupancy of the given
+            squares changed.
+            Only the given pieces (those that moved, were captured, or were
+            promoted) and the bishops, rooks, and queens whose rays pass
+            through one of the squares are looked at again. """
+
+        # Collect the pieces whose vision may have changed
+        affected = []
+
+        for piece in pieces:
+            if piece and piece not in affected:
+                affected += [piece]
+
+        # Pawn, knight, and king vision does not depend on other pieces,
+        # but a slider's ray stops at the first occupied square
+        for rank, file in changed:
+            for piece in self.attackers[rank][file]:
+                if BISHOP <= piece.kind <= QUEEN and piece not in affected:
+                    affected += [piece]
+
+        for piece in affected:
+            if piece.is_white:
+                counts = self.white_attacks
+            else:
+                counts = self.black_attacks
 
-        # Loop through all black pieces and add all squares in those pieces' vision lists.
-        for piece in self.black_pieces:
-            for square in piece.vision(self):
-                vision.add((square[0], square[1]))
+            # Take away the squares the piece used to see
+            for rank, file in self.vision_map.pop(piece, []):
+                counts[rank][file] -= 1
+                self.attackers[rank][file].discard(piece)
 
-        return vision
+            # Add the squares it sees now, unless it has left the board
+            if self.board[piece.rank][piece.file] is piece:
+                vision = piece.vision(self)
+                self.vision_map[piece] = vision
+
+                for rank, file in vision:
+                    counts[rank][file] += 1
+                    self.attackers[rank][file].add(piece)
 
 
 # Moves
@@ -109,80 +505,164 @@ class Board:
         return moves     
 
 
+# Legal moves
+    def legal_moves(self, is_white):
+        """ Return the list of legal moves for white (is_white True) or black,
+            each a packed move (see moves.py) to be played with make().
+            The list is computed once per position and cached until the next move,
+            together with whether the side's king is in check. """
+
+        # Serve the cached list if this position has already been examined
+        if is_white in self.legal_cache:
+            return self.legal_cache[is_white][0]
+
+        # Checks and pins are worked out once, so no move has to be tried (see legal.py)
+        self.legal_cache[is_white] = generate_legal(self, is_white)
+
+        return self.legal_cache[is_white][0]
+
+
 # In check
     def white_in_check(self):
         """ Return boolean value reflecting whether the white king is in check. """
 
-        if (self.white_king.rank, self.white_king.file) in self.black_vision():
-            return True
+        # Generating the legal moves found the checkers already
+        if True in self.legal_cache:
+            return self.legal_cache[True][1]
 
-        else:
-            return False
+        # Otherwise the attack counts answer this without generating any moves
+        return self.attacked(self.white_king.rank, self.white_king.file, False)
 
     def black_in_check(self):
         """ Return boolean value reflecting whether the black king is in check. """
 
-        if (self.black_king.rank, self.black_king.file) in self.white_vision():
-            return True
+        if False in self.legal_cache:
+            return self.legal_cache[False][1]
 
-        else:
-            return False
+        return self.attacked(self.black_king.rank, self.black_king.file, True)
 
 
 # Has move
     def white_has_move(self):
         """ Return boolean value reflecting whether white has a move. """
 
-        # Create a deep copy of the board
-        hypothetical = deepcopy(self)
+        if True in self.legal_cache:
+            return len(self.legal_cache[True][0]) > 0
 
-        # Assign the white move dictionary to a variable
-        piece_move_pairs = hypothetical.white_moves()
+        # Stop at the first legal move rather than generating them all
+        for move in MovePicker(self, is_white=True):
+            return True
 
-        # Loop through each white piece in the dictionary
-        for white_piece in piece_move_pairs:
+        return False
 
-            # Assign that piece's moves to a variable
-            piece_moves = piece_move_pairs[white_piece]
+    def black_has_move(self):
+        """ Return boolean value reflecting whether black has a move. """
 
-            # Loop through each of the piece's moves
-            for move in piece_moves:
+        if False in self.legal_cache:
+            return len(self.legal_cache[False][0]) > 0
 
-                # Execute the move on a hypothetical board
-                hypothetical.move(move[0], move[1], move[2], move[3], move[4])
+        for move in MovePicker(self, is_white=False):
+            return True
 
-                # If as a result of the move the white king is not in check,
-                # return True, i.e. white DOES have a move
-                if (hypothetical.white_king.rank, hypothetical.white_king.file) not in hypothetical.black_vision():
-                    return True
+        return False
 
-                # Reset the hypothetical board to a deep copy of the present board state
-                hypothetical = deepcopy(self)
 
-        # If the method reaches this line, no move out of check was found.
-        return False
+# Draws
+    def repetitions(self):
+        """ Return how many times the present position occurred before.
+            Captures and pawn moves can never be undone, so only positions
+            since the last of them (the halfmove clock) are looked at, and
+            of those only the ones with the same side to move. """
 
-    def black_has_move(self):
-        """ Return boolean value reflecting whether white has a move. """
+        key = self.hash
+        history = self.hash_history
+        count = 0
 
-        # See white_has_move() method annotations
+        # Positions two plies back cannot match: both sides would have to
+        # have taken their moves back
+        for back in range(4, min(self.halfmove_clock, len(history)) + 1, 2):
+            if history[-back] == key:
+                count += 1
 
-        hypothetical = deepcopy(self)
-        piece_move_pairs = hypothetical.black_moves()
+        return count
 
-        for black_piece in piece_move_pairs:
-            piece_moves = piece_move_pairs[black_piece]
+    def insufficient_material(self):
+        """ Return boolean value reflecting whether neither side has the
+            material to mate: kings and at most one knight or bishop, or
+            kings and bishops all on squares of the same color. """
 
-            for move in piece_moves:
-                hypothetical.move(move[0], move[1], move[2], move[3], move[4])
+        bitboards = self.bitboards
 
-                if (hypothetical.black_king.rank, hypothetical.black_king.file) not in hypothetical.white_vision():
-                    return True
+        if bitboards[WhitePawn] | bitboards[BlackPawn] | bitboards[WhiteRook] | bitboards[BlackRook] \
+                | bitboards[WhiteQueen] | bitboards[BlackQueen]:
+            return False
 
-                hypothetical = deepcopy(self)
+        knights = bitboards[WhiteKnight] | bitboards[BlackKnight]
+        bishops = bitboards[WhiteBishop] | bitboards[BlackBishop]
+        minors = knights | bishops
 
+        if not minors & (minors - 1):
+            return True
 
-        return False
+        return not knights and (not bishops & LIGHT_SQUARES or not bishops & DARK_SQUARES)
+
+    def draw_reason(self):
+        """ Return why the game is drawn, short of stalemate: 'threefold
+            repetition', 'the fifty-move rule' or 'insufficient material'.
+            Return None if it is not. """
+
+        if self.repetitions() >= 2:
+            return 'threefold repetition'
+
+        if self.halfmove_clock >= 100:
+            return 'the fifty-move rule'
+
+        if self.insufficient_material():
+            return 'insufficient material'
+
+        return None
+
+    def game_result(self):
+        """ Return (result, reason) if the game is over, where result is
+            '1-0', '0-1' or '1/2-1/2' and reason is 'checkmate', 'stalemate'
+            or a draw_reason(). Return None while the game goes on.
+            Checkmate and stalemate come first: a mate on the hundredth
+            halfmove ends the game as a mate. """
+
+        if not self.legal_moves(self.white_to_move):
+            if self.white_to_move:
+                in_check = self.white_in_check()
+            else:
+                in_check = self.black_in_check()
+
+            if not in_check:
+                return '1/2-1/2', 'stalemate'
+            if self.white_to_move:
+                return '0-1', 'checkmate'
+            return '1-0', 'checkmate'
+
+        draw = self.draw_reason()
+        if draw:
+            return '1/2-1/2', draw
+
+        return None
+
+    def announce_result(self):
+        """ Print how the game ended and return True, or return False if it goes on. """
+
+        ended = self.game_result()
+        if not ended:
+            return False
+
+        result, reason = ended
+        if reason == 'stalemate':
+            print('Stalemate')
+        elif reason == 'checkmate':
+            print('Checkmate. %s wins.' % ('White' if result == '1-0' else 'Black'))
+        else:
+            print('Draw by %s.' % reason)
+
+        return True
 
 
 # Process move
@@ -191,50 +671,21 @@ class Board:
             2. If white has a move, obtain user input specifying
                 the move the user would like to play and execute the move. """
 
-        # Assign booleans reflecting whether white is in check and
-        # whether white has a move out of check to variables
-        in_check = self.white_in_check()
-        has_move = self.white_has_move()
-
-        # Black wins if white is in check and has no move out of check
-        if in_check and not has_move:
-            print('Checkmate. Black wins.')
-            return False
-
-        # Stalemate if white is not in check but can only move into check
-        if not in_check and not has_move:
-            print('Stalemate')
+        # Checkmate, stalemate, or a draw by rule ends the game
+        if self.announce_result():
             return False
 
         # Notify player if in check but has a move
-        # NOTE: method only reaches this line if has_move == True
-        if in_check:
+        if self.white_in_check():
             print('Check.')
 
         # Initialize an empty list to contain all possible moves white has in the position
         possibles = []
 
-        # Create a deep copy of the board
-        hypothetical = deepcopy(self)
-
-        # Use helper method to obtain dictionary of all white moves
-        move_dict = hypothetical.white_moves()
-
-        # Loop through each move each piece can make
-        for piece in move_dict:
-            for move in move_dict[piece]:
-
-                # Execute the move on a hypothetical board
-                hypothetical.move(move[0], move[1], move[2], move[3], move[4])
-
-                # If the move does not expose the white king to check,
-                # add it to 'possibles' in appropriate format for comparison
-                # with user input
-                if (hypothetical.white_king.rank, hypothetical.white_king.file) not in hypothetical.black_vision(): 
-                    possibles += [[move[0], move[1], move[2], move[3]]]
-
-                # Reset the hypothetical board
-                hypothetical = deepcopy(self)
+        # Add each cached legal move to 'possibles' in appropriate format
+        # for comparison with user input
+        for move in self.legal_moves(True):
+            possibles += [list(move_squares(move))]
 
         # Initialize 'valid' as False and only set it to True
         # when the user has inputted a legal move
@@ -276,7 +727,7 @@ class Board:
             valid = True
         
         # White pawn promoting
-        if self.board[init_rank][init_file].__class__.__name__ == 'WhitePawn':
+        if self.board[init_rank][init_file].code == WHITE_PAWN:
             if init_rank == 1:
 
                 # Offer player choice of knight, bishop, rook, and queen
@@ -319,34 +770,16 @@ class Board:
 
         # See process_white() method annotations
 
-        in_check = self.black_in_check()
-        has_move = self.black_has_move()
-
-        if in_check and not has_move:
-            print('Checkmate. White wins.')
-            return False
-
-        if not in_check and not has_move:
-            print('Stalemate')
+        if self.announce_result():
             return False
 
-        if in_check:
+        if self.black_in_check():
             print('Check.')
 
         possibles = []
-        hypothetical = deepcopy(self)
 
-        move_dict = hypothetical.black_moves()
-
-        for piece in move_dict:
-            for move in move_dict[piece]:
-
-                hypothetical.move(move[0], move[1], move[2], move[3], move[4])
-
-                if (hypothetical.black_king.rank, hypothetical.black_king.file) not in hypothetical.white_vision(): 
-                    possibles += [[move[0], move[1], move[2], move[3]]]
-
-                hypothetical = deepcopy(self)
+        for move in self.legal_moves(False):
+            possibles += [list(move_squares(move))]
 
         valid = False
         move = None
@@ -354,7 +787,12 @@ class Board:
         while not valid:
             user_input = input('Enter move: ')
 
-            if len(user_input) != 5:
+            if len(user_input) != 5 \
+                 or user_input[1] not in self.ranks \
+                 or user_input[0] not in self.files \
+                 or user_input[4] not in self.ranks \
+                 or user_input[3] not in self.files \
+                 or user_input[2] != ' ':
                 print('Invalid format. Enter origin file/rank, destination file/rank, e.g. e2 e4')
                 continue
 
@@ -370,7 +808,7 @@ class Board:
             valid = True
             
         # Black pawn promoting
-        if self.board[init_rank][init_file].__class__.__name__ == 'BlackPawn':
+        if self.board[init_rank][init_file].code == BLACK_PAWN:
             if init_rank == 6:
                 promotion_choice = ''
                 while promotion_choice not in ['n', 'b', 'r', 'q']:
@@ -396,187 +834,317 @@ class Board:
 
 
 # Execute move on board
-    def move(self, init_rank, init_file, end_rank, end_file, end_piece=None):
+    def make(self, move):
+        """ Execute a packed move (see moves.py) with move(), creating
+            the promoted piece if the move promotes and passing the move's
+            flags along. """
+
+        init_rank, init_file, end_rank, end_file = move_squares(move)
+
+        end_piece = None
+        promotion = move_promotion(move)
+        if promotion:
+            end_piece = PROMOTION_PIECES[self.board[init_rank][init_file].is_white][promotion](end_rank, end_file)
+
+        return self.move(init_rank, init_file, end_rank, end_file, end_piece, move_flags(move))
+
+    def infer_flags(self, piece, init_rank, init_file, end_rank, end_file):
+        """ Return the flags (see moves.py) of the piece's move between the given squares. """
+
+        flags = 0
+
+        if self.board[end_rank][end_file]:
+            flags |= CAPTURE
+
+        # A pawn moving diagonally onto an empty square captures en passant
+        if piece.kind == PAWN:
+            if init_file != end_file and not self.board[end_rank][end_file]:
+                flags |= CAPTURE | EN_PASSANT
+            elif abs(init_rank - end_rank) == 2:
+                flags |= DOUBLE_PUSH
+
+        # A king moving two files castles
+        elif piece.kind == KING and abs(init_file - end_file) == 2:
+            flags |= CASTLING
+
+        return flags
+
+    def move(self, init_rank, init_file, end_rank, end_file, end_piece=None, flags=None):
         """ Execute a chess move on a board object.
             Handle captures when they occur.
             Detect and properly execute special moves: promotion, en passant, castling.
             Update castling rights if appropriate.
-            Update board object move ledger. 
+            Update board object move ledger and push an undo record for unmove().
             NOTE: end_piece defaults to None but takes the value of the promoted piece
-                if promotion occurs. """
+                if promotion occurs. flags are the move's flags (see moves.py),
+                worked out from the squares if not given. """
         
         # Assign the piece to be moved to a variable
         piece = self.board[init_rank][init_file]
 
+        # Generated moves come with their flags (see make()); moves
+        # entered by square do not
+        if flags is None:
+            flags = self.infer_flags(piece, init_rank, init_file, end_rank, end_file)
+
+        # Start an undo record holding everything unmove() needs to put
+        # the board back exactly as it was before this move.
+        undo = {'piece': piece,
+                'init_rank': init_rank,
+                'init_file': init_file,
+                'end_rank': end_rank,
+                'end_file': end_file,
+                'end_piece': end_piece,
+                'piece_index': None,
+                'captured': None,
+                'captured_rank': None,
+                'captured_file': None,
+                'captured_index': None,
+                'rook': None,
+                'rook_init_file': None,
+                'rook_end_file': None,
+                'rook_index': None,
+                'white_can_castle': self.white_can_castle,
+                'black_can_castle': self.black_can_castle,
+                'halfmove_clock': self.halfmove_clock}
+        self.undo_stack += [undo]
+        self.hash_history += [self.hash]
+
+        # Cached legal moves belong to the previous position
+        self.legal_cache = {}
+
         ### SPECIAL MOVES
         # 1. Promotion
         if end_piece:
-            # print('Caught promotion')
 
-            if piece.is_white:
-                # Update white pieces: remove pawn, add promoted piece
-                self.white_pieces.remove(piece)
-                self.white_pieces += [end_piece]
-
-                # Capture if appropriate
-                if self.board[end_rank][end_file]:
-                    self.white_captures += [self.board[end_rank][end_file]]
-                    self.black_pieces.remove(self.board[end_rank][end_file])
-
-                # Occupy square
-                self.board[init_rank][init_file] = None
-                self.board[end_rank][end_file] = end_piece
-
-                return True
+            # Capture if appropriate
+            self.capture(end_rank, end_file, undo)
 
+            # Update the promoting side's pieces: remove pawn, add promoted piece
+            if piece.is_white:
+                pieces = self.white_pieces
             else:
-                # Update black pieces: remove pawn, add promoted piece
-                self.black_pieces.remove(piece)
-                self.black_pieces += [end_piece]
-
-                # Capture if appropriate
-                if self.board[end_rank][end_file]:
-                    self.black_captures += [self.board[end_rank][end_file]]
-                    self.white_pieces.remove(self.board[end_rank][end_file])
+                pieces = self.black_pieces
 
-                # Occupy square
-                self.board[init_rank][init_file] = None
-                self.board[end_rank][end_file] = end_piece
+            undo['piece_index'] = pieces.index(piece)
+            del pieces[undo['piece_index']]
+            pieces += [end_piece]
 
-                return True
+            # Occupy square
+            end_piece.rank = end_rank
+            end_piece.file = end_file
+            self.set_square(init_rank, init_file, None)
+            self.set_square(end_rank, end_file, end_piece)
 
         # 2. En passant
         # Moving piece is a pawn and it is capturing a pawn
         # of the opposite color on the square it moved THROUGH,
         # not the square it is ON
-        if piece.__class__.__name__ in ['WhitePawn', 'BlackPawn']:
-            if init_file != end_file and not self.board[end_rank][end_file]:
-                # print('Caught en passant')
-
-                # Update board appropriately
-                if piece.__class__.__name__ == 'WhitePawn':
-                    piece.rank = end_rank
-                    piece.file = end_file
-                    self.board[init_rank][init_file] = None
-                    self.board[end_rank][end_file] = piece
-
-                    self.white_captures += [self.board[end_rank + 1][end_file]]
-                    self.black_pieces.remove(self.board[end_rank + 1][end_file])
-                    self.board[end_rank + 1][end_file] = None
+        elif flags & EN_PASSANT:
 
-                    
+            # The captured pawn sits beside the capturing pawn,
+            # i.e. on the capturing pawn's rank and the destination file
+            self.capture(init_rank, end_file, undo)
 
-                else:
-                    piece.rank = end_rank
-                    piece.file = end_file
-                    self.board[init_rank][init_file] = None
-                    self.board[end_rank][end_file] = piece
-
-                    self.black_captures += [self.board[end_rank - 1][end_file]]
-                    self.white_pieces.remove(self.board[end_rank - 1][end_file])
-                    self.board[end_rank - 1][end_file] = None
+            piece.rank = end_rank
+            piece.file = end_file
+            self.set_square(init_rank, init_file, None)
+            self.set_square(end_rank, end_file, piece)
 
-                return True
-        
         # 3. Castling
         # King and rook move simultaneously.
-        if piece.__class__.__name__ in ['WhiteKing', 'BlackKing']:
-            if abs(init_file - end_file) == 2:
-                # print('Caught castling')
+        elif flags & CASTLING:
+
+            # Kingside rook travels h -> f, queenside rook travels a -> d
+            if end_file == 6:
+                rook_init_file, rook_end_file = 7, 5
+            else:
+                rook_init_file, rook_end_file = 0, 3
+
+            rook = self.board[init_rank][rook_init_file]
+            undo['rook'] = rook
+            undo['rook_init_file'] = rook_init_file
+            undo['rook_end_file'] = rook_end_file
 
             # Update board appropriately.
-                # White castle
-                if piece.__class__.__name__ == 'WhiteKing':
-                    # Kingside
-                    if end_file == 6:
-                        self.white_king.rank = 7
-                        self.white_king.file = 6
-                        self.board[init_rank][init_file] = None
-                        self.board[7][6] = self.white_king
-
-                        self.board[7][5] = self.board[7][7]
-                        self.board[7][7] = None
-                        self.board[7][5].rank, self.board[7][5].file = 7, 5
-
-                    # Queenside
-                    else:
-                        self.white_king.rank = 7
-                        self.white_king.file = 2
-                        self.board[init_rank][init_file] = None
-                        self.board[7][2] = self.white_king
-
-                        self.board[7][3] = self.board[7][0]
-                        self.board[7][0] = None
-                        self.board[7][3].rank, self.board[7][3].file = 7, 3
-
-                    self.white_can_castle = False       
-                        
-                # Black castle
-                else:
-                    # Kingside
-                    if end_file == 6:
-                        self.black_king.rank = 0
-                        self.black_king.file = 6
-                        self.board[init_rank][init_file] = None
-                        self.board[0][6] = self.black_king
-
-                        self.board[0][5] = self.board[0][7]
-                        self.board[0][7] = None
-                        self.board[0][5].rank, self.board[0][5].file = 0, 5
-
-                    # Queenside
-                    else:
-                        self.black_king.rank = 0
-                        self.black_king.file = 2
-                        self.board[init_rank][init_file] = None
-                        self.board[0][2] = self.black_king
-
-                        self.board[0][3] = self.board[7][0]
-                        self.board[0][0] = None
-                        self.board[0][3].rank, self.board[0][3].file = 0, 3
-                    
-                    self.black_can_castle = False
-    
-                return True
-        ### END SPECIAL MOVES
+            piece.rank = end_rank
+            piece.file = end_file
+            self.set_square(init_rank, init_file, None)
+            self.set_square(end_rank, end_file, piece)
 
-        # Handle capture if target square occupied
-        if self.board[end_rank][end_file]:
+            rook.file = rook_end_file
+            self.set_square(init_rank, rook_init_file, None)
+            self.set_square(init_rank, rook_end_file, rook)
 
-            # White captures black
-            if not self.board[end_rank][end_file].is_white:
-                self.white_captures += [self.board[end_rank][end_file]]
-                self.black_pieces.remove(self.board[end_rank][end_file])
-            
-            # Black captures white
+            if piece.is_white:
+                self.white_can_castle = False
             else:
-                self.black_captures += [self.board[end_rank][end_file]]
-                self.white_pieces.remove(self.board[end_rank][end_file])       
+                self.black_can_castle = False
+        ### END SPECIAL MOVES
+
+        else:
+            # Handle capture if target square occupied
+            self.capture(end_rank, end_file, undo)
 
-        # Update the moving piece's attributes
-        if not end_piece:
+            # Update the moving piece's attributes
             piece.rank = end_rank
             piece.file = end_file
 
-        # Update the location of the piece on the board
-        self.board[init_rank][init_file] = None
-        self.board[end_rank][end_file] = piece
+            # Update the location of the piece on the board
+            self.set_square(init_rank, init_file, None)
+            self.set_square(end_rank, end_file, piece)
+
+            # Check if rook or king moved and update castling rights accordingly
+            if piece in self.white_rooks:
+                undo['rook_index'] = self.white_rooks.index(piece)
+                self.white_rooks.remove(piece)
+            if piece in self.black_rooks:
+                undo['rook_index'] = self.black_rooks.index(piece)
+                self.black_rooks.remove(piece)
+            if piece is self.white_king:
+                self.white_can_castle = False
+            if piece is self.black_king:
+                self.black_can_castle = False
+
+        # Update attack maps around every square whose occupancy changed
+        self.update_attacks(self.changed_squares(undo), [piece, end_piece, undo['captured'], undo['rook']])
+
+        # Advance the move counters
+        if piece.kind == PAWN or undo['captured']:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if not piece.is_white:
+            self.fullmove_number += 1
 
-        # Check if rook or king moved and update castling rights accordingly
-        if piece in self.white_rooks:
-            self.white_rooks.remove(piece)
-        if piece in self.black_rooks:
-            self.black_rooks.remove(piece)
-        if piece is self.white_king:
-            self.white_can_castle = False
-        if piece is self.black_king:
-            self.black_can_castle = False
+        # Pass the turn to the other side
+        self.white_to_move = not self.white_to_move
+        self.zobrist ^= SIDE_KEY
 
         # Add the move to the move ledger
         self.moves += [[piece, init_rank, init_file, end_rank, end_file, end_piece]]
 
         return True
 
+    def capture(self, rank, file, undo):
+        """ Remove the piece on the given square, if any, from the board and
+            from its side's pieces, crediting it to the capturing side.
+            Record what was taken in the undo record of the move in progress. """
+
+        captured = self.board[rank][file]
+
+        if not captured:
+            return
+
+        # White captures black
+        if not captured.is_white:
+            pieces = self.black_pieces
+            self.white_captures += [captured]
+
+        # Black captures white
+        else:
+            pieces = self.white_pieces
+            self.black_captures += [captured]
+
+        undo['captured'] = captured
+        undo['captured_rank'] = rank
+        undo['captured_file'] = file
+        undo['captured_index'] = pieces.index(captured)
+
+        del pieces[undo['captured_index']]
+        self.set_square(rank, file, None)
+
+    def changed_squares(self, undo):
+        """ Return the squares whose occupancy the move in the undo record changes. """
+
+        squares = [(undo['init_rank'], undo['init_file']), (undo['end_rank'], undo['end_file'])]
+
+        # En passant captures off the destination square
+        if undo['captured']:
+            squares += [(undo['captured_rank'], undo['captured_file'])]
+
+        # Castling also moves the rook
+        if undo['rook']:
+            squares += [(undo['init_rank'], undo['rook_init_file']), (undo['init_rank'], undo['rook_end_file'])]
+
+        return squares
+
+# Take back move
+    def unmove(self):
+        """ Take back the last move executed by move().
+            Restore captured pieces, promoted pawns, castling rooks,
+            castling rights, and the move ledger exactly as they were. """
+
+        # Pop the undo record and the ledger entry of the last move
+        undo = self.undo_stack.pop()
+        del self.moves[-1]
+        del self.hash_history[-1]
+        self.legal_cache = {}
+
+        piece = undo['piece']
+        end_piece = undo['end_piece']
+
+        if piece.is_white:
+            pieces = self.white_pieces
+            rooks = self.white_rooks
+        else:
+            pieces = self.black_pieces
+            rooks = self.black_rooks
+
+        # Lift the moved (or promoted) piece off its destination square
+        self.set_square(undo['end_rank'], undo['end_file'], None)
+
+        # Promotion: swap the promoted piece back for the pawn
+        if end_piece:
+            pieces.remove(end_piece)
+            pieces.insert(undo['piece_index'], piece)
+
+        # Return the moving piece to its origin square
+        piece.rank = undo['init_rank']
+        piece.file = undo['init_file']
+        self.set_square(undo['init_rank'], undo['init_file'], piece)
+
+        # Castling: return the rook to its corner
+        if undo['rook']:
+            rook = undo['rook']
+            rook.file = undo['rook_init_file']
+            self.set_square(rook.rank, undo['rook_end_file'], None)
+            self.set_square(rook.rank, undo['rook_init_file'], rook)
+
+        # Rook lost castling rights by moving: grant them back
+        if undo['rook_index'] is not None:
+            rooks.insert(undo['rook_index'], piece)
+
+        # Capture: put the captured piece back on its square and in its side's pieces
+        if undo['captured']:
+            captured = undo['captured']
+            self.set_square(undo['captured_rank'], undo['captured_file'], captured)
+
+            if captured.is_white:
+                self.white_pieces.insert(undo['captured_index'], captured)
+                del self.black_captures[-1]
+            else:
+                self.black_pieces.insert(undo['captured_index'], captured)
+                del self.white_captures[-1]
+
+        # Restore castling rights
+        self.white_can_castle = undo['white_can_castle']
+        self.black_can_castle = undo['black_can_castle']
+
+        # Restore the move counters
+        self.halfmove_clock = undo['halfmove_clock']
+        if not piece.is_white:
+            self.fullmove_number -= 1
+
+        # Hand the turn back
+        self.white_to_move = not self.white_to_move
+        self.zobrist ^= SIDE_KEY
+
+        # Update attack maps around every square whose occupancy changed
+        self.update_attacks(self.changed_squares(undo), [piece, end_piece, undo['captured'], undo['rook']])
+
+        return True
+
 
 # Print board
     def print_board(self):
@@ -0,0 +1,248 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+from board import *
+from pieces import *
+from pgn import open_games, parse_san, move_to_san
+
+# Opening book
+# A book file is a sequence of 16-byte entries sorted by position key, laid
+# out as in Polyglot books (all fields big-endian):
+#   key     8 bytes  position key
+#   move    2 bytes  move, encoded as below
+#   weight  2 bytes  how often the move should be chosen, relative to the
+#                    other moves of the position
+#   learn   4 bytes  unused, 0
+# The key is our own Zobrist key, Board.hash (see zobrist.py), rather than
+# Polyglot's, so books are built from PGN files with this module; the
+# entries and moves follow Polyglot byte for byte.
+#
+# The file is memory-mapped rather than read, and the entries of a position
+# are found by binary search, so opening even a very large book costs
+# nothing and a probe touches only a few pages of it.
+
+ENTRY_BYTES = 16
+ENTRY = struct.Struct('>QHHI')
+KEY = struct.Struct('>Q')
+
+MAX_WEIGHT = 0xFFFF
+
+# Weight a move earns from each game it was played in, by result from the
+# point of view of the side that played it
+WIN_WEIGHT = 2
+DRAW_WEIGHT = 1
+
+def encode_book_move(move):
+    """ Return the Polyglot encoding of a packed move:
+          bits  0-2  to file      bits 6-8   from file
+          bits  3-5  to row       bits 9-11  from row
+          bits 12-14 promotion piece (1 knight, 2 bishop, 3 rook, 4 queen)
+        Rows count from rank 1 up, and castling is written as the king
+        capturing its own rook. """
+
+    from_sq = move_from(move)
+    to_sq = move_to(move)
+    to_file = to_sq & 7
+
+    if move & CASTLING:
+        to_file = 7 if to_file == 6 else 0
+
+    return to_file \
+        | (7 - (to_sq >> 3)) << 3 \
+        | (from_sq & 7) << 6 \
+        | (7 - (from_sq >> 3)) << 9 \
+        | move_promotion(move) << 12
+
+class OpeningBook:
+    """ Read-only opening book file (see above), memory-mapped. """
+
+    def __init__(self, path):
+        """ Opening book constructor. Maps the file; nothing is read until probed. """
+
+        self.path = path
+        self.file = open(path, 'rb')
+
+        size = os.fstat(self.file.fileno()).st_size
+        self.entries = size // ENTRY_BYTES
+
+        # An empty file cannot be mapped, and has nothing to find anyway
+        if self.entries:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.map = None
+
+    def __len__(self):
+        """ Return the number of entries in the book. """
+
+        return self.entries
+
+    def __enter__(self):
+        """ Return the book for use in a with statement. """
+
+        return self
+
+    def __exit__(self, *exception):
+        """ Close the book at the end of a with statement. """
+
+        self.close()
+
+    def close(self):
+        """ Unmap and close the book file. """
+
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def first_entry(self, key):
+        """ Return the index of the first entry whose key is not less than key. """
+
+        low, high = 0, self.entries
+
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.map, middle * ENTRY_BYTES)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def lookup(self, key):
+        """ Return the (book move, weight) pairs stored under a position key. """
+
+        found = []
+
+        index = self.first_entry(key)
+        while index < self.entries:
+            entry_key, book_move, weight, learn = ENTRY.unpack_from(self.map, index * ENTRY_BYTES)
+            if entry_key != key:
+                break
+            found += [(book_move, weight)]
+            index += 1
+
+        return found
+
+    def probe(self, board):
+        """ Return the (packed move, weight) pairs of the book for the board's
+            position, heaviest first. Book moves that are not legal in the
+            position (a key collision or a broken book) are left out. """
+
+        found = self.lookup(board.hash)
+        if not found:
+            return []
+
+        legal = {}
+        for move in board.legal_moves(board.white_to_move):
+            legal[encode_book_move(move)] = move
+
+        moves = [(legal[book_move], weight) for book_move, weight in found if book_move in legal]
+        moves.sort(key=lambda pair: pair[1], reverse=True)
+
+        return moves
+
+    def choose(self, board, generator=random):
+        """ Return a book move for the board's position, picked at random in
+            proportion to the weights, or None if the position is not in the book. """
+
+        moves = self.probe(board)
+
+        total = sum(weight for move, weight in moves)
+        if not total:
+            return moves[0][0] if moves else None
+
+        pick = generator.randrange(total)
+        for move, weight in moves:
+            if pick < weight:
+                return move
+            pick -= weight
+
+# Building
+def build_book(games, path, max_plies=20):
+    """ Write a book of the first max_plies plies of each game to path and
+        return the number of entries. A move's weight is WIN_WEIGHT per game
+        the side playing it won and DRAW_WEIGHT per game drawn or unfinished;
+        moves only ever played by the losing side are left out. """
+
+    weights = {}
+
+    for game in games:
+        if game.result == '1-0':
+            results = {True: WIN_WEIGHT, False: 0}
+        elif game.result == '0-1':
+            results = {True: 0, False: WIN_WEIGHT}
+        else:
+            results = {True: DRAW_WEIGHT, False: DRAW_WEIGHT}
+
+        # A game whose starting position cannot be set up adds nothing
+        try:
+            board = game.board()
+        except ValueError:
+            continue
+
+        for san in game.moves[:max_plies]:
+            try:
+                move = parse_san(board, san)
+            except ValueError:
+                break
+
+            entry = (board.hash, encode_book_move(move))
+            weights[entry] = weights.get(entry, 0) + results[board.white_to_move]
+
+            board.make(move)
+
+    entries = sorted((key, book_move, weight) for (key, book_move), weight in weights.items() if weight)
+
+    # Weights are 16-bit: scale them all down together if any would overflow
+    heaviest = max([weight for key, book_move, weight in entries], default=0)
+    if heaviest > MAX_WEIGHT:
+        entries = [(key, book_move, max(1, weight * MAX_WEIGHT // heaviest)) for key, book_move, weight in entries]
+
+    with open(path, 'wb') as book:
+        for key, book_move, weight in entries:
+            book.write(ENTRY.pack(key, book_move, weight, 0))
+
+    return len(entries)
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Build or probe an opening book.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='build a book from the openings of a PGN file')
+    build.add_argument('pgn', help='PGN file')
+    build.add_argument('book', help='book file to write')
+    build.add_argument('--plies', type=int, default=20, help='plies of each game to take (default: 20)')
+
+    probe = commands.add_parser('probe', help='list the book moves of a position')
+    probe.add_argument('book', help='book file')
+    probe.add_argument('--fen', default=START_FEN, help='position to look up (default: start position)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        count = build_book(open_games(args.pgn), args.book, args.plies)
+        print('%d entries written to %s' % (count, args.book))
+        return 0
+
+    board = Board.from_fen(args.fen)
+    with OpeningBook(args.book) as book:
+        moves = book.probe(board)
+
+    if not moves:
+        print('position not in book')
+        return 1
+
+    total = sum(weight for move, weight in moves)
+    for move, weight in moves:
+        print('%-8s weight %5d  %5.1f%%' % (move_to_san(board, move), weight, 100 * weight / max(total, 1)))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
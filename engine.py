@@ -0,0 +1,392 @@
+import argparse
+import sys
+import time
+
+from board import *
+from pieces import *
+from perft import move_name
+from see import see
+from book import OpeningBook
+from tt import *
+
+# Scores are in centipawns from the point of view of the side to move
+# (see evaluation.py).
+# A mate found at ply n scores MATE - n so that shorter mates score higher.
+MATE = 100000
+INFINITY = 1000000
+
+# How often (in nodes) the search looks at the clock and the stop flag.
+CHECK_INTERVAL = 1024
+
+class SearchAborted(Exception):
+    """ Raised inside the search when the time or node budget runs out
+        or a stop is requested. """
+
+def material(board):
+    """ Return the material balance of the position in pawns from
+        the point of view of the side to move. A cruder alternative to
+        evaluation.evaluate(), which the engine uses by default. """
+
+    score = 0
+
+    for piece in board.white_pieces:
+        score += getattr(piece, 'value', 0)
+    for piece in board.black_pieces:
+        score -= getattr(piece, 'value', 0)
+
+    if board.white_to_move:
+        return score
+    else:
+        return -score
+
+class Engine:
+    """ Negamax alpha-beta search with iterative deepening. """
+
+    def __init__(self, max_depth=64, time_limit=None, node_limit=None, evaluate=evaluate, hash_mb=16, book=None):
+        """ Engine constructor.
+            time_limit is in seconds; time_limit and node_limit of None mean no limit.
+            hash_mb sizes the transposition table, which persists between searches.
+            book is an OpeningBook (see book.py) whose moves are played without searching. """
+
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.evaluate = evaluate
+        self.tt = TranspositionTable(hash_mb)
+        self.book = book
+
+        # Called after every completed iteration with the engine itself,
+        # e.g. to print search progress.
+        self.on_iteration = None
+
+        # Set from another thread to end the search early.
+        self.stop_requested = False
+
+        # Search statistics of the last search
+        self.nodes = 0
+        self.depth = 0
+        self.seconds = 0
+        self.pv = []
+        self.score = 0
+
+        # Two killer moves per ply: quiet moves that caused a cutoff in a
+        # sibling position, tried right after the captures
+        self.killers = []
+
+# Search
+    def search(self, board):
+        """ Search the position on board and return (best move, score).
+            The best move is a packed move (see moves.py), or None if
+            the side to move has no legal move. The board is left as it was found.
+            A book move is returned at once with score 0 and depth 0. """
+
+        self.nodes = 0
+        self.depth = 0
+        self.pv = []
+        self.score = 0
+        self.killers = [[0, 0] for ply in range(self.max_depth + 1)]
+        self.stop_requested = False
+        self.start_time = time.perf_counter()
+
+        if self.book:
+            move = self.book.choose(board)
+            if move:
+                self.pv = [move]
+                self.seconds = time.perf_counter() - self.start_time
+                return move, 0
+
+        # Undo records below this point belong to the search
+        root_length = len(board.undo_stack)
+
+        best_move = None
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score, pv = self.search_root(board, depth)
+            except SearchAborted:
+                # Unwind whatever the interrupted iteration left on the board
+                while len(board.undo_stack) > root_length:
+                    board.unmove()
+                break
+
+            self.depth = depth
+            self.score = score
+            self.pv = pv
+            best_move = pv[0] if pv else None
+            self.seconds = time.perf_counter() - self.start_time
+
+            if self.on_iteration:
+                self.on_iteration(self)
+
+            # No legal move at the root, or a forced mate found: deeper search changes nothing
+            if not pv or abs(score) >= MATE - self.max_depth:
+                break
+
+        self.seconds = time.perf_counter() - self.start_time
+
+        # Out of time before depth 1 finished: fall back to any legal move
+        if best_move is None:
+            moves = board.legal_moves(board.white_to_move)
+            if moves:
+                best_move = moves[0]
+
+        return best_move, self.score
+
+    def nps(self):
+        """ Return nodes per second of the last search. """
+
+        return self.nodes / max(self.seconds, 1e-9)
+
+    def search_root(self, board, depth):
+        """ Search the root position to the given depth.
+            Return (score, principal variation). """
+
+        moves = self.order_moves(board, board.legal_moves(board.white_to_move), self.pv[:1])
+
+        if not moves:
+            return self.terminal_score(board, 0), []
+
+        alpha, beta = -INFINITY, INFINITY
+        best_pv = []
+
+        for move in moves:
+            board.make(move)
+            score, pv = self.negamax(board, depth - 1, -beta, -alpha, 1, move in self.pv[:1])
+            score = -score
+            board.unmove()
+
+            if score > alpha:
+                alpha = score
+                best_pv = [move] + pv
+
+        return alpha, best_pv
+
+    def negamax(self, board, depth, alpha, beta, ply, on_pv=False):
+        """ Return (score, principal variation) of the position searched
+            to the given depth within the alpha-beta window. on_pv is True
+            for the positions along the previous iteration's principal variation. """
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        # A position seen before in the game or the search is scored as a
+        # draw: whoever allowed the repetition can repeat again
+        if board.repetitions() or board.halfmove_clock >= 100 or board.insufficient_material():
+            return 0, []
+
+        # Settle pending captures before trusting the evaluation
+        if depth <= 0:
+            return self.quiesce(board, alpha, beta, ply), []
+
+        key = board.hash
+        original_alpha = alpha
+
+        # A result stored from an earlier visit may settle this node outright
+        entry = self.tt.probe(key)
+        hash_move = 0
+        if entry:
+            entry_depth, bound, score, hash_move = entry
+            score = score_from_tt(score, ply)
+
+            if entry_depth >= depth:
+                if bound == EXACT \
+                        or (bound == LOWER and score >= beta) \
+                        or (bound == UPPER and score <= alpha):
+                    return score, []
+
+        # The move the previous iteration found best here, if this position is on its PV
+        pv_move = self.pv[ply] if on_pv and ply < len(self.pv) else 0
+
+        # Without a stored move, try that move first
+        if not hash_move:
+            hash_move = pv_move
+
+        # Moves are generated stage by stage, so a cutoff saves generating the rest
+        picker = MovePicker(board, hash_move, self.killers[ply])
+
+        best_score = -INFINITY
+        best_pv = []
+
+        for move in picker:
+            board.make(move)
+            score, pv = self.negamax(board, depth - 1, -beta, -alpha, ply + 1, move == pv_move)
+            score = -score
+            board.unmove()
+
+            if score > best_score:
+                best_score = score
+                best_pv = [move] + pv
+
+            if score > alpha:
+                alpha = score
+
+            # The opponent will not allow this line
+            if alpha >= beta:
+                # Remember a quiet refutation for the sibling positions
+                if picker.stage in [KILLERS, QUIETS] and move != self.killers[ply][0]:
+                    self.killers[ply] = [move, self.killers[ply][0]]
+                break
+
+        # Checkmate or stalemate
+        if not best_pv:
+            return self.terminal_score(board, ply), []
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, bound, score_to_tt(best_score, ply), encode_move(best_pv[0]))
+
+        return best_score, best_pv
+
+    def quiesce(self, board, alpha, beta, ply):
+        """ Return the score of the position once the captures and
+            promotions worth making have been played out. The side to move
+            may stand pat on the evaluation instead of capturing, unless it
+            is in check, when every evasion is searched. Captures that lose
+            material in the exchange (see see.py) are not searched. """
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        if board.white_to_move:
+            in_check = board.white_in_check()
+        else:
+            in_check = board.black_in_check()
+
+        if in_check:
+            best_score = -INFINITY
+        else:
+            best_score = self.evaluate(board)
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+
+        for move in MovePicker(board, quiets=in_check):
+            if not in_check and see(board, move) < 0:
+                continue
+
+            board.make(move)
+            score = -self.quiesce(board, -beta, -alpha, ply + 1)
+            board.unmove()
+
+            if score > best_score:
+                best_score = score
+
+            if score > alpha:
+                alpha = score
+
+            if alpha >= beta:
+                break
+
+        # Checkmate
+        if best_score == -INFINITY:
+            return -MATE + ply
+
+        return best_score
+
+    def terminal_score(self, board, ply):
+        """ Return the score of a position with no legal moves: mated or stalemated. """
+
+        if board.white_to_move:
+            king = board.white_king
+        else:
+            king = board.black_king
+
+        if board.attacked(king.rank, king.file, not board.white_to_move):
+            return -MATE + ply
+
+        return 0
+
+    def order_moves(self, board, moves, first):
+        """ Return moves with those in first leading, then captures of the
+            most valuable victims, then the rest. """
+
+        def key(move):
+            if move in first:
+                return -INFINITY
+            to_sq = move_to(move)
+            victim = board.board[to_sq >> 3][to_sq & 7]
+            if victim:
+                return -getattr(victim, 'value', 0)
+            return 0
+
+        return sorted(moves, key=key)
+
+    def check_limits(self):
+        """ Raise SearchAborted if the search is over budget or told to stop. """
+
+        if self.stop_requested:
+            raise SearchAborted()
+
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+
+        if self.time_limit is not None and time.perf_counter() - self.start_time >= self.time_limit:
+            raise SearchAborted()
+
+def score_to_tt(score, ply):
+    """ Return a score as stored in the transposition table: mate scores
+        count plies from this node rather than from the root. """
+
+    if score > MATE - 1000:
+        return score + ply
+    if score < -MATE + 1000:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    """ Return a stored score as seen from a node ply plies below the root. """
+
+    if score > MATE - 1000:
+        return score - ply
+    if score < -MATE + 1000:
+        return score + ply
+    return score
+
+def print_iteration(engine):
+    """ Print one line of search progress. """
+
+    print('depth %d  score %d  nodes %d  time %.2fs  nps %.0f  tt hits %.0f%%  hashfull %d  pv %s'
+          % (engine.depth, engine.score, engine.nodes, engine.seconds, engine.nps(),
+             100 * engine.tt.hit_rate(), engine.tt.hashfull(),
+             ' '.join(move_name(move) for move in engine.pv)))
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Search a position for the best move.')
+    parser.add_argument('--fen', default=START_FEN, help='position to search (default: start position)')
+    parser.add_argument('--depth', type=int, default=64, help='maximum depth in plies')
+    parser.add_argument('--time', type=float, default=None, help='time budget in seconds')
+    parser.add_argument('--nodes', type=int, default=None, help='node budget')
+    parser.add_argument('--hash', type=int, default=16, help='transposition table size in MB')
+    parser.add_argument('--book', help='opening book file (see book.py)')
+    args = parser.parse_args(argv)
+
+    if args.time is None and args.nodes is None and args.depth == 64:
+        args.time = 5.0
+
+    book = OpeningBook(args.book) if args.book else None
+
+    engine = Engine(max_depth=args.depth, time_limit=args.time, node_limit=args.nodes, hash_mb=args.hash, book=book)
+    engine.on_iteration = print_iteration
+
+    best_move, score = engine.search(Board.from_fen(args.fen))
+
+    if best_move and engine.depth == 0:
+        print('bestmove %s  (book)' % move_name(best_move))
+    elif best_move:
+        print('bestmove %s  score %d' % (move_name(best_move), score))
+    else:
+        print('no legal move')
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+from pieces import *
+
+# Evaluation
+# A position is scored in centipawns as material plus piece-square
+# bonuses, each with a middlegame and an endgame value. The two are
+# blended by game phase, which falls from MAX_PHASE with all minor and
+# major pieces on the board to 0 with only kings and pawns left.
+# Board.set_square() keeps the running white-minus-black middlegame and
+# endgame sums and the phase up to date as pieces come and go, so
+# evaluate() only has to blend them.
+
+# Material by piece kind (see pieces.py): none, pawn, knight, bishop, rook, queen, king
+MIDDLEGAME_VALUES = [0, 100, 320, 330, 500, 900, 0]
+ENDGAME_VALUES = [0, 120, 300, 320, 520, 920, 0]
+
+# Phase weight by piece kind
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+# Piece-square bonuses from white's point of view, laid out as the board
+# is printed: a8 to h8 first, a1 to h1 last, which is square order.
+PAWN_MIDDLEGAME = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0]
+
+PAWN_ENDGAME = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     20,  20,  20,  20,  20,  20,  20,  20,
+     10,  10,  10,  10,  10,  10,  10,  10,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0]
+
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50]
+
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20]
+
+ROOK_TABLE = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0]
+
+QUEEN_TABLE = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20]
+
+# The king shelters behind its pawns in the middlegame and heads for the centre in the endgame
+KING_MIDDLEGAME = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20]
+
+KING_ENDGAME = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50]
+
+# (middlegame, endgame) tables by piece kind
+PIECE_SQUARE_TABLES = [None,
+                       (PAWN_MIDDLEGAME, PAWN_ENDGAME),
+                       (KNIGHT_TABLE, KNIGHT_TABLE),
+                       (BISHOP_TABLE, BISHOP_TABLE),
+                       (ROOK_TABLE, ROOK_TABLE),
+                       (QUEEN_TABLE, QUEEN_TABLE),
+                       (KING_MIDDLEGAME, KING_ENDGAME)]
+
+def score_tables():
+    """ Return the middlegame and endgame score tables, indexed by piece
+        code and square: material plus piece-square bonus, positive for
+        white pieces and negative for black ones. Black reads the white
+        tables upside down. """
+
+    middlegame = [None] * ((BLACK | KING) + 1)
+    endgame = [None] * ((BLACK | KING) + 1)
+
+    for kind in [PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING]:
+        middlegame_table, endgame_table = PIECE_SQUARE_TABLES[kind]
+
+        middlegame[WHITE | kind] = [MIDDLEGAME_VALUES[kind] + middlegame_table[sq] for sq in range(64)]
+        endgame[WHITE | kind] = [ENDGAME_VALUES[kind] + endgame_table[sq] for sq in range(64)]
+
+        # Flipping the rank of a square number mirrors it top to bottom
+        middlegame[BLACK | kind] = [-(MIDDLEGAME_VALUES[kind] + middlegame_table[sq ^ 56]) for sq in range(64)]
+        endgame[BLACK | kind] = [-(ENDGAME_VALUES[kind] + endgame_table[sq ^ 56]) for sq in range(64)]
+
+    return middlegame, endgame
+
+MIDDLEGAME_SCORES, ENDGAME_SCORES = score_tables()
+
+def evaluate(board):
+    """ Return the score of the position in centipawns from the point of
+        view of the side to move, blending the board's running middlegame
+        and endgame sums by phase. """
+
+    # Promotions can push the phase past its starting value
+    phase = min(board.phase, MAX_PHASE)
+    score = (board.middlegame_score * phase + board.endgame_score * (MAX_PHASE - phase)) // MAX_PHASE
+
+    if board.white_to_move:
+        return score
+    else:
+        return -score
+
+def scan_scores(board):
+    """ Return (middlegame sum, endgame sum, phase) of the board worked out
+        from scratch. They always equal the board's running sums. """
+
+    middlegame = 0
+    endgame = 0
+    phase = 0
+
+    for piece in board.white_pieces + board.black_pieces:
+        sq = piece.rank * 8 + piece.file
+        middlegame += MIDDLEGAME_SCORES[piece.code][sq]
+        endgame += ENDGAME_SCORES[piece.code][sq]
+        phase += PHASE_WEIGHTS[piece.kind]
+
+    return middlegame, endgame, phase
@@ -0,0 +1,151 @@
+from bitboard import *
+from sliders import *
+from squares import *
+from pieces import *
+from moves import *
+
+# Legal move generation
+# A pseudo-legal move (see Piece.moves()) is illegal only if it leaves its
+# own king attacked. Rather than play every move and look at the king, the
+# position is examined once:
+#   checkers  the enemy pieces giving check
+#   pinned    for each own piece pinned to the king, the line through
+#             the king and the pinner, which the piece may not leave
+# and every move is then judged with a few bitboard tests:
+#   - in double check only the king may move
+#   - in single check other pieces must capture the checker or block it
+#   - a pinned piece must stay on its pin ray
+#   - the king must not step onto an attacked square, counting attacks
+#     along the ray it is leaving (the king does not shield that square)
+#   - en passant removes two pawns from a rank at once, so it is judged by
+#     the attacks on the king once both have gone
+
+def attackers_of(board, sq, by_white, occupied):
+    """ Return the bitboard of by_white's pieces that attack sq when
+        exactly the squares in occupied are occupied. """
+
+    bitboards = board.bitboards
+
+    # A pawn attacks sq from the squares an opposite pawn on sq would attack
+    if by_white:
+        pawns = bitboards[WhitePawn] & BLACK_PAWN_ATTACKS[sq]
+        knights, bishops, rooks = bitboards[WhiteKnight], bitboards[WhiteBishop], bitboards[WhiteRook]
+        queens, kings = bitboards[WhiteQueen], bitboards[WhiteKing]
+    else:
+        pawns = bitboards[BlackPawn] & WHITE_PAWN_ATTACKS[sq]
+        knights, bishops, rooks = bitboards[BlackKnight], bitboards[BlackBishop], bitboards[BlackRook]
+        queens, kings = bitboards[BlackQueen], bitboards[BlackKing]
+
+    return pawns \
+        | (KNIGHT_ATTACKS[sq] & knights) \
+        | (KING_ATTACKS[sq] & kings) \
+        | (bishop_attacks(sq, occupied) & (bishops | queens)) \
+        | (rook_attacks(sq, occupied) & (rooks | queens))
+
+def legal_state(board, is_white):
+    """ Return (king square, checkers, check mask, pinned) for white
+        (is_white True) or black in the board's position. The check mask
+        holds the squares a piece other than the king must move to: every
+        square when not in check, the checker and the squares between it and
+        the king in single check. pinned maps each pinned piece's square to
+        the line through the king that it may not leave. """
+
+    bitboards = board.bitboards
+
+    if is_white:
+        king = board.white_king
+        own = board.white_occupied
+        enemy = board.black_occupied
+        diagonal = bitboards[BlackBishop] | bitboards[BlackQueen]
+        straight = bitboards[BlackRook] | bitboards[BlackQueen]
+    else:
+        king = board.black_king
+        own = board.black_occupied
+        enemy = board.white_occupied
+        diagonal = bitboards[WhiteBishop] | bitboards[WhiteQueen]
+        straight = bitboards[WhiteRook] | bitboards[WhiteQueen]
+
+    king_sq = king.rank * 8 + king.file
+    checkers = attackers_of(board, king_sq, not is_white, board.occupied)
+
+    if not checkers:
+        check_mask = -1
+    elif checkers & (checkers - 1):
+        check_mask = 0
+    else:
+        check_mask = checkers | BETWEEN[king_sq][lsb(checkers)]
+
+    # Enemy sliders that would see the king through its own pieces
+    snipers = (bishop_attacks(king_sq, enemy) & diagonal) | (rook_attacks(king_sq, enemy) & straight)
+
+    pinned = {}
+    for sniper_sq in square_indices(snipers):
+        ray = BETWEEN[king_sq][sniper_sq]
+        blockers = ray & board.occupied
+
+        # Exactly one piece in the way, and it is ours
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            # Along the line the piece can reach no further than the king
+            # and the pinner, so the whole line serves as its mask
+            pinned[lsb(blockers)] = LINE[king_sq][sniper_sq]
+
+    return king_sq, checkers, check_mask, pinned
+
+def is_legal_move(board, move, state):
+    """ Return whether a pseudo-legal move is legal, given the legal_state()
+        of the side making it. """
+
+    king_sq, checkers, check_mask, pinned = state
+
+    from_sq = move & 63
+    to_bit = 1 << ((move >> 6) & 63)
+
+    # King moves: the destination must not be attacked once the king has left its square
+    if from_sq == king_sq:
+        is_white = board.board[from_sq >> 3][from_sq & 7].is_white
+        return not attackers_of(board, (move >> 6) & 63, not is_white, board.occupied ^ (1 << from_sq))
+
+    # Only the king moves out of double check
+    if not check_mask:
+        return False
+
+    # En passant: look at the king with both pawns gone and the capturer arrived
+    if move & EN_PASSANT:
+        captured_bit = 1 << ((from_sq & ~7) | ((move >> 6) & 7))
+        occupied = (board.occupied ^ (1 << from_sq) ^ captured_bit) | to_bit
+        is_white = board.board[from_sq >> 3][from_sq & 7].is_white
+        return not attackers_of(board, king_sq, not is_white, occupied) & ~captured_bit
+
+    if not to_bit & check_mask:
+        return False
+
+    if from_sq in pinned and not to_bit & pinned[from_sq]:
+        return False
+
+    return True
+
+def generate_legal(board, is_white):
+    """ Return (legal moves, in check) for white (is_white True) or black. """
+
+    state = legal_state(board, is_white)
+    king_sq, checkers, check_mask, pinned = state
+
+    # In double check only the king's moves need generating
+    if check_mask == 0:
+        if is_white:
+            pieces = [board.white_king]
+        else:
+            pieces = [board.black_king]
+    elif is_white:
+        pieces = board.white_pieces
+    else:
+        pieces = board.black_pieces
+
+    legal = []
+
+    for piece in pieces:
+        for move in piece.moves(board):
+            if is_legal_move(board, move, state):
+                legal += [move]
+
+    return legal, checkers != 0
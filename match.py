@@ -0,0 +1,345 @@
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+from board import *
+from pieces import *
+from engine import Engine, material
+from book import OpeningBook
+from batch import read_jobs, job_board
+from perft import move_name
+
+# Matches
+# Two engine configurations play each other from a list of opening
+# positions. Every opening is played twice, once with each configuration
+# as white, so that neither profits from a lucky set of openings. Games
+# run on a pool of worker processes and are written to a results file one
+# line each, tab-separated:
+#   game  opening  white  result  reason  plies  a_moves  a_seconds  b_moves  b_seconds  moves
+# where white is A or B, and moves are in coordinate notation separated
+# by spaces.
+#
+# An engine configuration is written as comma-separated settings, e.g.
+#   depth=4,time=0.5,nodes=20000,hash=4,eval=material,book=openings.bin
+
+# Games still going after this many plies are adjudicated drawn
+MAX_PLIES = 300
+
+# Evaluation functions a configuration may name
+EVALUATIONS = {'evaluate': evaluate, 'material': material}
+
+# Per-process state: the configurations and any books they open
+worker = {}
+
+def parse_config(text):
+    """ Return the settings of an engine configuration string (see above).
+        Raise ValueError for an unknown or malformed setting. """
+
+    config = {'depth': None, 'time': None, 'nodes': None, 'hash': 16, 'eval': 'evaluate', 'book': None}
+
+    for setting in filter(None, text.split(',')):
+        if '=' not in setting:
+            raise ValueError('malformed setting %s' % setting)
+
+        name, value = setting.split('=', 1)
+        if name not in config:
+            raise ValueError('unknown setting %s' % name)
+
+        if name in ['depth', 'nodes', 'hash']:
+            config[name] = int(value)
+        elif name == 'time':
+            config[name] = float(value)
+        elif name == 'eval' and value not in EVALUATIONS:
+            raise ValueError('unknown evaluation %s' % value)
+        else:
+            config[name] = value
+
+    # Without any limit a search would run to depth 64
+    if config['depth'] is None:
+        if config['time'] is None and config['nodes'] is None:
+            config['depth'] = 3
+        else:
+            config['depth'] = 64
+
+    return config
+
+def init_worker(configs, max_plies):
+    """ Set up a worker process for a match. """
+
+    worker['configs'] = configs
+    worker['max_plies'] = max_plies
+    worker['books'] = {}
+
+def make_engine(config):
+    """ Return a new engine with the given settings. Books are opened once per process. """
+
+    book = None
+    if config['book']:
+        if config['book'] not in worker['books']:
+            worker['books'][config['book']] = OpeningBook(config['book'])
+        book = worker['books'][config['book']]
+
+    return Engine(max_depth=config['depth'], time_limit=config['time'], node_limit=config['nodes'],
+                  evaluate=EVALUATIONS[config['eval']], hash_mb=config['hash'], book=book)
+
+def play_game(job):
+    """ Play one game of a match and return its result dict.
+        job is (game number, opening number, opening FEN, A plays white). """
+
+    game, opening, fen, a_is_white = job
+
+    # Fresh engines, so that no game depends on the ones before it
+    engines = {name: make_engine(config) for name, config in worker['configs'].items()}
+    seconds = {'A': 0, 'B': 0}
+    moves = {'A': 0, 'B': 0}
+    names = []
+
+    board = Board.from_fen(fen)
+
+    while True:
+        ended = board.game_result()
+        if ended:
+            result, reason = ended
+            break
+
+        if len(names) >= worker['max_plies']:
+            result, reason = '1/2-1/2', 'adjudication'
+            break
+
+        # Configuration A moves when the side to move is the side A plays
+        player = 'A' if board.white_to_move == a_is_white else 'B'
+
+        start = time.perf_counter()
+        move, score = engines[player].search(board)
+        seconds[player] += time.perf_counter() - start
+        moves[player] += 1
+
+        names += [move_name(move)]
+        board.make(move)
+
+    return {'game': game,
+            'opening': opening,
+            'white': 'A' if a_is_white else 'B',
+            'result': result,
+            'reason': reason,
+            'plies': len(names),
+            'moves': moves,
+            'seconds': seconds,
+            'names': names}
+
+def a_score(result):
+    """ Return configuration A's score from a game: 1, 0.5, or 0. """
+
+    if result['result'] == '1/2-1/2':
+        return 0.5
+
+    white_won = result['result'] == '1-0'
+    a_is_white = result['white'] == 'A'
+
+    return 1 if white_won == a_is_white else 0
+
+def elo_difference(score):
+    """ Return the Elo difference that an expected score of score means. """
+
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+
+    # Adding 0.0 turns the -0.0 of an even score into 0.0
+    return -400 * math.log10(1 / score - 1) + 0.0
+
+def elo_interval(scores):
+    """ Return the Elo difference of A over B from A's game scores, with the
+        low and high ends of its 95% confidence interval. An end may be
+        infinite when the games were too few or too one-sided to bound it. """
+
+    games = len(scores)
+    if not games:
+        return 0, -math.inf, math.inf
+
+    mean = sum(scores) / games
+
+    # One game says nothing about how far the next might differ
+    if games < 2:
+        return elo_difference(mean), -math.inf, math.inf
+
+    # When every game scored the same, as in a clean sweep or all draws, the
+    # games show no spread at all. Take them as if half a game had gone the
+    # other way: a sweep with one game drawn, or all draws with one won and
+    # one lost.
+    if all(score == scores[0] for score in scores):
+        if mean == 0.5:
+            scores = [1, 0] + scores[2:]
+        else:
+            scores = [0.5] + scores[1:]
+        mean = sum(scores) / games
+
+    deviation = math.sqrt(sum((score - mean) ** 2 for score in scores) / games)
+
+    # The error in the mean score, carried through to Elo
+    margin = 1.96 * deviation / math.sqrt(games)
+
+    return elo_difference(mean), elo_difference(mean - margin), elo_difference(mean + margin)
+
+def format_elo(elo, low, high):
+    """ Return an Elo difference and its 95% interval (see elo_interval()) for
+        printing: as a margin either way, or as a one-sided bound when one
+        end of the interval is infinite. """
+
+    if math.isinf(low) and math.isinf(high):
+        return '%.0f, unbounded' % elo
+    if math.isinf(high):
+        return '%.0f, at least %.0f' % (elo, low)
+    if math.isinf(low):
+        return '%.0f, at most %.0f' % (elo, high)
+
+    return '%.0f +/- %.0f' % (elo, (high - low) / 2)
+
+def format_result(result):
+    """ Return the results-file line of a game (see above). """
+
+    return '\t'.join([str(result['game']), str(result['opening']), result['white'], result['result'],
+                      result['reason'], str(result['plies']),
+                      str(result['moves']['A']), '%.3f' % result['seconds']['A'],
+                      str(result['moves']['B']), '%.3f' % result['seconds']['B'],
+                      ' '.join(result['names'])])
+
+class MatchRunner:
+    """ Plays a match between two engine configurations on a pool of worker
+        processes and keeps its statistics. """
+
+    def __init__(self, config_a, config_b, workers=None, max_plies=MAX_PLIES):
+        """ Match runner constructor. workers defaults to one per core. """
+
+        self.configs = {'A': config_a, 'B': config_b}
+        self.workers = workers or os.cpu_count() or 1
+        self.max_plies = max_plies
+
+        self.results = []
+        self.seconds = 0
+
+    def jobs(self, openings, games):
+        """ Return the games to play: each opening in turn, twice over with
+            colors swapped, until there are enough games. """
+
+        jobs = []
+
+        for game in range(games):
+            opening = (game // 2) % len(openings)
+            jobs += [(game, opening, openings[opening], game % 2 == 0)]
+
+        return jobs
+
+    def run(self, openings, games):
+        """ Yield the result of each game as it finishes. """
+
+        start = time.perf_counter()
+        settings = (self.configs, self.max_plies)
+        jobs = self.jobs(openings, games)
+
+        # A single worker plays here, without the cost of a pool
+        if self.workers == 1:
+            init_worker(*settings)
+            results = map(play_game, jobs)
+        else:
+            pool = multiprocessing.Pool(self.workers, init_worker, settings)
+            results = pool.imap_unordered(play_game, jobs)
+
+        try:
+            for result in results:
+                self.results += [result]
+                self.seconds = time.perf_counter() - start
+                yield result
+        finally:
+            if self.workers != 1:
+                pool.terminate()
+
+    def record(self):
+        """ Return A's (wins, draws, losses). """
+
+        scores = [a_score(result) for result in self.results]
+
+        return scores.count(1), scores.count(0.5), scores.count(0)
+
+    def elo(self):
+        """ Return the Elo difference of A over B and its 95% interval (see elo_interval()). """
+
+        return elo_interval([a_score(result) for result in self.results])
+
+    def time_per_move(self, name):
+        """ Return a configuration's average time per move in seconds. """
+
+        moves = sum(result['moves'][name] for result in self.results)
+        seconds = sum(result['seconds'][name] for result in self.results)
+
+        return seconds / max(moves, 1)
+
+def read_openings(path):
+    """ Return the FEN of each position in a file of FEN or EPD lines, or
+        of the final position of each game of a PGN file. """
+
+    openings = []
+
+    for job in read_jobs(path):
+        label, board = job_board(job)
+        openings += [board.to_fen()]
+
+    return openings
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Play a match between two engine configurations.')
+    parser.add_argument('--a', default='', help='configuration A, e.g. depth=3 (default: depth=3)')
+    parser.add_argument('--b', default='', help='configuration B (default: depth=3)')
+    parser.add_argument('--games', type=int, default=100, help='games to play (default: 100)')
+    parser.add_argument('--openings', help='FEN/EPD or PGN file of opening positions (default: start position)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help='adjudicate a draw after this many plies')
+    parser.add_argument('--output', help='results file to write (see match.py)')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args(argv)
+
+    try:
+        config_a, config_b = parse_config(args.a), parse_config(args.b)
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        openings = read_openings(args.openings) if args.openings else [START_FEN]
+    except ValueError as error:
+        parser.error(str(error))
+    if not openings:
+        parser.error('no openings in %s' % args.openings)
+
+    runner = MatchRunner(config_a, config_b, args.workers, args.max_plies)
+    output = open(args.output, 'w') if args.output else None
+
+    try:
+        for result in runner.run(openings, args.games):
+            if output:
+                output.write(format_result(result) + '\n')
+                output.flush()
+
+            if not args.quiet:
+                print('game %d: %s %s (%s, %d plies)  A %d-%d-%d'
+                      % (result['game'], 'A-B' if result['white'] == 'A' else 'B-A',
+                         result['result'], result['reason'], result['plies'], *runner.record()))
+    finally:
+        if output:
+            output.close()
+
+    wins, draws, losses = runner.record()
+
+    print('%d games in %.1fs: A %d wins, %d draws, %d losses' % (len(runner.results), runner.seconds, wins, draws, losses))
+    print('Elo difference A - B: %s (95%%)' % format_elo(*runner.elo()))
+    print('time per move: A %.3fs, B %.3fs' % (runner.time_per_move('A'), runner.time_per_move('B')))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
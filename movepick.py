@@ -0,0 +1,144 @@
+from pieces import *
+from moves import *
+from legal import *
+
+# Staged move picking
+# A search usually needs only the first few moves of a position before a
+# cutoff, so moves are handed out in stages, each generated only when the
+# one before it runs dry:
+#   1. the hash move (the best move stored for the position)
+#   2. captures and promotions, most valuable victim first and, among
+#      captures of the same victim, least valuable attacker first (MVV/LVA)
+#   3. killer moves (quiet moves that caused a cutoff at the same ply)
+#   4. all other quiet moves
+# Only legal moves are handed out. Checks and pins are worked out once
+# (see legal.py) and each move is judged just before it is handed out.
+
+HASH = 1
+CAPTURES = 2
+KILLERS = 3
+QUIETS = 4
+
+# Piece values by kind for ordering, the king counting last as an attacker
+ORDER_VALUES = [0, 1, 3, 3, 5, 9, 20]
+
+# Values of the promotion codes (see moves.py)
+PROMOTION_VALUES = [0, 3, 3, 5, 9]
+
+class MovePicker:
+    """ Hands out the legal moves of a position in stages (see above).
+        Iterate over it, or over its moves() generator. """
+
+    def __init__(self, board, hash_move=0, killers=(), is_white=None, quiets=True):
+        """ Move picker constructor.
+            hash_move and killers are packed moves or their 16-bit codes
+            (see tt.encode_move); 0 means none. is_white defaults to the side to move.
+            With quiets False only the hash move and the captures and
+            promotions are handed out, as a quiescence search wants. """
+
+        self.board = board
+        self.is_white = board.white_to_move if is_white is None else is_white
+        self.hash_move = hash_move & MOVE_MASK
+        self.quiets = quiets
+
+        self.killers = []
+        for killer in killers:
+            if killer and killer & MOVE_MASK not in self.killers:
+                self.killers += [killer & MOVE_MASK]
+
+        # Stage of the move handed out last
+        self.stage = None
+
+    def __iter__(self):
+        """ Return a generator of the legal moves. """
+
+        return self.moves()
+
+    def moves(self):
+        """ Yield the legal moves of the position, stage by stage. """
+
+        board = self.board
+
+        if self.is_white:
+            pieces = board.white_pieces
+        else:
+            pieces = board.black_pieces
+
+        state = legal_state(board, self.is_white)
+
+        # 1. Hash move
+        if self.hash_move:
+            move = self.find(self.hash_move)
+            if move and is_legal_move(board, move, state):
+                self.stage = HASH
+                yield move
+
+        # 2. Captures and promotions
+        captures = []
+        for piece in pieces:
+            captures += piece.captures(board)
+        captures.sort(key=self.mvv_lva, reverse=True)
+
+        for move in captures:
+            if move & MOVE_MASK != self.hash_move and is_legal_move(board, move, state):
+                self.stage = CAPTURES
+                yield move
+
+        if not self.quiets:
+            return
+
+        # 3. Killers still quiet and possible in this position
+        for killer in self.killers:
+            if killer == self.hash_move:
+                continue
+            move = self.find(killer)
+            if move and not move & CAPTURE and not move_promotion(move) and is_legal_move(board, move, state):
+                self.stage = KILLERS
+                yield move
+
+        # 4. Quiet moves
+        skip = [self.hash_move] + self.killers
+        quiets = []
+        for piece in pieces:
+            quiets += piece.quiets(board)
+
+        for move in quiets:
+            if move & MOVE_MASK not in skip and is_legal_move(board, move, state):
+                self.stage = QUIETS
+                yield move
+
+    def find(self, code):
+        """ Return the move of the side to pick for with the given 16-bit code,
+            or None if no piece of that side has such a move here. """
+
+        from_sq = code & 63
+        piece = self.board.board[from_sq >> 3][from_sq & 7]
+
+        if not piece or piece.is_white != self.is_white:
+            return None
+
+        for move in piece.moves(self.board):
+            if move & MOVE_MASK == code:
+                return move
+
+        return None
+
+    def mvv_lva(self, move):
+        """ Return the ordering score of a capture or promotion. """
+
+        board = self.board
+        to_sq = move_to(move)
+        from_sq = move_from(move)
+
+        victim = board.board[to_sq >> 3][to_sq & 7]
+        attacker = board.board[from_sq >> 3][from_sq & 7]
+
+        # En passant takes a pawn from beside the destination square
+        if victim:
+            victim_value = ORDER_VALUES[victim.kind]
+        elif move & EN_PASSANT:
+            victim_value = ORDER_VALUES[PAWN]
+        else:
+            victim_value = 0
+
+        return (victim_value + PROMOTION_VALUES[move_promotion(move)]) * 100 - ORDER_VALUES[attacker.kind]
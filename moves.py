@@ -0,0 +1,56 @@
+# Moves
+# A move is packed into a single int:
+#   bits  0-5   from square (numbered as in bitboard.py)
+#   bits  6-11  to square
+#   bits 12-14  promotion piece code, 0 for none
+#   bits 16-19  flags marking captures and special moves
+# The low 16 bits identify a move within its position; the flags only
+# spare whoever executes or orders the move from working it out again.
+
+# Promotion piece codes, in the order moves are generated
+KNIGHT_PROMOTION = 1
+BISHOP_PROMOTION = 2
+ROOK_PROMOTION = 3
+QUEEN_PROMOTION = 4
+PROMOTIONS = [KNIGHT_PROMOTION, BISHOP_PROMOTION, ROOK_PROMOTION, QUEEN_PROMOTION]
+
+# Letters of the promotion codes in coordinate notation, e.g. e7e8q
+PROMOTION_LETTERS = ' nbrq'
+
+# Flags
+CAPTURE = 1 << 16
+DOUBLE_PUSH = 1 << 17
+EN_PASSANT = 1 << 18
+CASTLING = 1 << 19
+
+MOVE_MASK = 0xFFFF
+
+def pack_move(from_sq, to_sq, promotion=0, flags=0):
+    """ Return the move from one square to another. """
+
+    return from_sq | (to_sq << 6) | (promotion << 12) | flags
+
+def move_from(move):
+    """ Return the from square of a move. """
+
+    return move & 63
+
+def move_to(move):
+    """ Return the to square of a move. """
+
+    return (move >> 6) & 63
+
+def move_promotion(move):
+    """ Return the promotion piece code of a move, 0 if it is not a promotion. """
+
+    return (move >> 12) & 7
+
+def move_flags(move):
+    """ Return the flags of a move. """
+
+    return move & ~MOVE_MASK
+
+def move_squares(move):
+    """ Return (init_rank, init_file, end_rank, end_file) of a move. """
+
+    return (move >> 3) & 7, move & 7, (move >> 9) & 7, (move >> 6) & 7
@@ -0,0 +1,175 @@
+import argparse
+import sys
+import time
+
+from board import *
+from pieces import *
+
+# Perft
+# Perft counts the leaf nodes of the legal move tree to a fixed depth.
+# Matching published counts exercises every rule the move generators and
+# Board.move implement (captures, castling, en passant, promotion, check),
+# and timing the count measures move generation and make/unmake throughput.
+
+# Reference positions with their published node counts by depth.
+POSITIONS = [
+    ('start', START_FEN,
+        {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+        {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ('en passant pins', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+        {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ('promotions', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+        {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ('promotion captures', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+        {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ('middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+        {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+    ('illegal en passant 1', '3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1',
+        {6: 1134888}),
+    ('illegal en passant 2', '8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1',
+        {6: 1015133}),
+    ('en passant gives check', '8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1',
+        {6: 1440467}),
+    ('short castling gives check', '5k2/8/8/8/8/8/8/4K2R w K - 0 1',
+        {6: 661072}),
+    ('long castling gives check', '3k4/8/8/8/8/8/8/R3K3 w Q - 0 1',
+        {6: 803711}),
+    ('castling rights', 'r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1',
+        {4: 1274206}),
+    ('castling prevented', 'r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1',
+        {4: 1720476}),
+    ('promote out of check', '2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1',
+        {6: 3821001}),
+    ('discovered check', '8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1',
+        {5: 1004658}),
+    ('promote to give check', '4k3/1P6/8/8/8/8/K7/8 w - - 0 1',
+        {6: 217342}),
+    ('underpromote to give check', '8/P1k5/K7/8/8/8/8/8 w - - 0 1',
+        {6: 92683}),
+    ('self stalemate', 'K1k5/8/P7/8/8/8/8/8 w - - 0 1',
+        {6: 2217}),
+    ('stalemate and checkmate 1', '8/k1P5/8/1K6/8/8/8/8 w - - 0 1',
+        {7: 567584}),
+    ('stalemate and checkmate 2', '8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1',
+        {4: 23527}),
+]
+
+def move_name(move):
+    """ Return a move in coordinate notation, e.g. e2e4 or e7e8q. """
+
+    init_rank, init_file, end_rank, end_file = move_squares(move)
+    name = 'abcdefgh'[init_file] + str(8 - init_rank) + 'abcdefgh'[end_file] + str(8 - end_rank)
+
+    if move_promotion(move):
+        name += PROMOTION_LETTERS[move_promotion(move)]
+
+    return name
+
+def perft(board, depth):
+    """ Return the number of leaf nodes of the legal move tree to the given depth. """
+
+    if depth == 0:
+        return 1
+
+    moves = board.legal_moves(board.white_to_move)
+
+    # The last ply only needs counting, not playing
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+
+    for move in moves:
+        board.make(move)
+        nodes += perft(board, depth - 1)
+        board.unmove()
+
+    return nodes
+
+def divide(board, depth):
+    """ Return (move name, leaf nodes) pairs for each legal root move. """
+
+    results = []
+
+    for move in board.legal_moves(board.white_to_move):
+        board.make(move)
+        if depth > 1:
+            nodes = perft(board, depth - 1)
+        else:
+            nodes = 1
+        board.unmove()
+
+        results += [(move_name(move), nodes)]
+
+    return results
+
+def timed_perft(board, depth):
+    """ Return (nodes, seconds) for a perft run. """
+
+    start = time.perf_counter()
+    nodes = perft(board, depth)
+
+    return nodes, time.perf_counter() - start
+
+def run_suite(max_depth, out=sys.stdout):
+    """ Run every reference position at each depth up to max_depth that has
+        a published count. Print nodes, time, and nodes per second for each
+        run and return the number of mismatches. """
+
+    failures = 0
+    total_nodes = 0
+    total_seconds = 0
+
+    for name, fen, expected in POSITIONS:
+        for depth in sorted(expected):
+            if depth > max_depth:
+                break
+
+            nodes, seconds = timed_perft(Board.from_fen(fen), depth)
+            total_nodes += nodes
+            total_seconds += seconds
+
+            status = 'ok' if nodes == expected[depth] else 'FAIL (expected %d)' % expected[depth]
+            if nodes != expected[depth]:
+                failures += 1
+
+            print('%-28s depth %d  %10d nodes  %8.2fs  %8.0f nps  %s'
+                  % (name, depth, nodes, seconds, nodes / max(seconds, 1e-9), status), file=out)
+
+    print('total %d nodes in %.2fs, %.0f nps, %d failures'
+          % (total_nodes, total_seconds, total_nodes / max(total_seconds, 1e-9), failures), file=out)
+
+    return failures
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Count legal move paths and time move generation.')
+    parser.add_argument('depth', type=int, help='search depth in plies')
+    parser.add_argument('--fen', default=START_FEN, help='position to count from (default: start position)')
+    parser.add_argument('--divide', action='store_true', help='print the node count below each root move')
+    parser.add_argument('--suite', action='store_true', help='run the reference positions up to the given depth')
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return 1 if run_suite(args.depth) else 0
+
+    board = Board.from_fen(args.fen)
+    start = time.perf_counter()
+
+    if args.divide:
+        nodes = 0
+        for name, count in divide(board, args.depth):
+            print('%s: %d' % (name, count))
+            nodes += count
+    else:
+        nodes = perft(board, args.depth)
+
+    seconds = time.perf_counter() - start
+    print('nodes %d  time %.2fs  nps %.0f' % (nodes, seconds, nodes / max(seconds, 1e-9)))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
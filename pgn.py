@@ -0,0 +1,364 @@
+import argparse
+import re
+import sys
+import time
+
+from board import *
+from pieces import *
+
+# PGN
+# Games are read one at a time from any iterable of lines (usually an open
+# file), so memory use depends on the longest game, not the size of the file.
+
+RESULTS = ['1-0', '0-1', '1/2-1/2', '*']
+
+# A move number, glued to its move or not: 12. 12... 12.e4
+MOVE_NUMBER = re.compile(r'^\d+\.+')
+
+# Piece parent classes by SAN letter, pawns having no letter
+SAN_PIECES = {'N': Knight, 'B': Bishop, 'R': Rook, 'Q': Queen, 'K': King, '': Pawn}
+
+class Game:
+    """ One game of a PGN file: its tag pairs, SAN moves, and result. """
+
+    def __init__(self):
+        """ Game constructor. """
+
+        self.headers = {}
+        self.moves = []
+        self.result = '*'
+
+    def board(self):
+        """ Return a board set up at the game's starting position.
+            Raise ValueError if the FEN header cannot be read. """
+
+        if 'FEN' not in self.headers:
+            return Board.from_fen(START_FEN)
+
+        fen = self.headers['FEN']
+        try:
+            board = Board.from_fen(fen)
+        except (KeyError, IndexError, AttributeError, ValueError):
+            raise ValueError('unreadable FEN header %s' % fen)
+
+        # Without both kings no move could be generated
+        if not board.white_king or not board.black_king:
+            raise ValueError('FEN header %s lacks a king' % fen)
+
+        return board
+
+    def replay(self):
+        """ Play the game's moves on a new board and return the board.
+            Raise ValueError on the first move that is not legal. """
+
+        board = self.board()
+
+        for san in self.moves:
+            board.make(parse_san(board, san))
+
+        return board
+
+# Reading
+def tokenize(text):
+    """ Return the move text tokens of a game with comments, variations,
+        numeric annotation glyphs, and move numbers removed. """
+
+    tokens = []
+    token = ''
+    depth = 0
+    index = 0
+
+    while index < len(text):
+        char = text[index]
+
+        # Brace comments run to the closing brace
+        if char == '{':
+            end = text.find('}', index)
+            index = len(text) if end == -1 else end + 1
+            char = ' '
+
+        # Semicolon comments run to the end of the line
+        elif char == ';':
+            end = text.find('\n', index)
+            index = len(text) if end == -1 else end + 1
+            char = ' '
+
+        else:
+            index += 1
+
+        # Variations nest and are skipped whole
+        if char == '(':
+            depth += 1
+            char = ' '
+        elif char == ')':
+            depth -= 1
+            char = ' '
+
+        if depth:
+            continue
+
+        if char.isspace():
+            if token:
+                tokens += [token]
+                token = ''
+        else:
+            token += char
+
+    if token:
+        tokens += [token]
+
+    moves = []
+    for token in tokens:
+        if token in RESULTS:
+            moves += [token]
+            continue
+
+        # Drop move numbers, but not the digits of 0-0 and 0-0-0
+        token = MOVE_NUMBER.sub('', token)
+        if token and not token.isdigit() and not token.startswith('$'):
+            moves += [token]
+
+    return moves
+
+def read_games(lines):
+    """ Yield each Game in an iterable of PGN lines. """
+
+    game = None
+    movetext = ''
+
+    for line in lines:
+        stripped = line.strip()
+
+        # Escape lines and blank lines before movetext carry nothing
+        if stripped.startswith('%'):
+            continue
+
+        if stripped.startswith('['):
+            # A tag pair after movetext starts the next game
+            if game and movetext.strip():
+                yield finish(game, movetext)
+                game, movetext = None, ''
+
+            if game is None:
+                game = Game()
+
+            tag, value = stripped[1:-1].split(None, 1) if ' ' in stripped else (stripped[1:-1], '""')
+            game.headers[tag] = value.strip().strip('"')
+            continue
+
+        if stripped:
+            if game is None:
+                game = Game()
+            movetext += line
+            if not movetext.endswith('\n'):
+                movetext += '\n'
+
+            # A result token ends the movetext
+            if stripped.split()[-1] in RESULTS:
+                yield finish(game, movetext)
+                game, movetext = None, ''
+
+    if game and (movetext.strip() or game.headers):
+        yield finish(game, movetext)
+
+def finish(game, movetext):
+    """ Fill a game's moves and result in from its movetext and return it. """
+
+    tokens = tokenize(movetext)
+
+    if tokens and tokens[-1] in RESULTS:
+        game.result = tokens[-1]
+        tokens = tokens[:-1]
+    elif 'Result' in game.headers:
+        game.result = game.headers['Result']
+
+    game.moves = tokens
+
+    return game
+
+def open_games(path):
+    """ Yield each Game in a PGN file, reading it incrementally. """
+
+    with open(path, encoding='utf-8', errors='replace') as pgn:
+        for game in read_games(pgn):
+            yield game
+
+# SAN
+def parse_san(board, san):
+    """ Return the legal packed move (see moves.py) that a SAN string names
+        in the board's position. Raise ValueError if there is none. """
+
+    moves = board.legal_moves(board.white_to_move)
+    text = san.rstrip('+#!?')
+
+    # Castling
+    if text in ['O-O', '0-0', 'O-O-O', '0-0-0']:
+        file = 6 if len(text) == 3 else 2
+        for move in moves:
+            if move & CASTLING and move_to(move) & 7 == file:
+                return move
+        raise ValueError('illegal move %s' % san)
+
+    # Promotion piece, written e8=Q or e8Q
+    promotion = 0
+    if '=' in text:
+        text, letter = text.split('=', 1)
+        if len(letter) != 1 or letter.upper() not in 'NBRQ':
+            raise ValueError('unreadable move %s' % san)
+        promotion = PROMOTION_LETTERS.index(letter.lower())
+    elif len(text) > 2 and text[-1] in 'NBRQ' and text[-2] in '18':
+        text, promotion = text[:-1], PROMOTION_LETTERS.index(text[-1].lower())
+
+    # Moving piece, destination, and whatever disambiguates the origin
+    if text and text[0] in 'NBRQK':
+        piece_class, text = SAN_PIECES[text[0]], text[1:]
+    else:
+        piece_class = Pawn
+
+    text = text.replace('x', '').replace('-', '')
+    if len(text) < 2 or text[-2] not in board.files or text[-1] not in board.ranks:
+        raise ValueError('unreadable move %s' % san)
+
+    end_rank, end_file = board.ranks[text[-1]], board.files[text[-2]]
+    origin = text[:-2]
+
+    found = []
+    for move in moves:
+        init_rank, init_file, move_rank, move_file = move_squares(move)
+        if move_rank != end_rank or move_file != end_file:
+            continue
+        if not isinstance(board.board[init_rank][init_file], piece_class):
+            continue
+        if move_promotion(move) != promotion:
+            continue
+        if any(char in board.files and board.files[char] != init_file for char in origin):
+            continue
+        if any(char in board.ranks and board.ranks[char] != init_rank for char in origin):
+            continue
+        found += [move]
+
+    if len(found) != 1:
+        raise ValueError('%s move %s' % ('ambiguous' if found else 'illegal', san))
+
+    return found[0]
+
+def move_to_san(board, move):
+    """ Return the SAN string of a legal move in the board's position. """
+
+    init_rank, init_file, end_rank, end_file = move_squares(move)
+    piece = board.board[init_rank][init_file]
+    destination = 'abcdefgh'[end_file] + str(8 - end_rank)
+
+    if move & CASTLING:
+        san = 'O-O' if end_file == 6 else 'O-O-O'
+
+    else:
+        capture = move & CAPTURE
+
+        if isinstance(piece, Pawn):
+            san = ('abcdefgh'[init_file] + 'x' if capture else '') + destination
+            if move_promotion(move):
+                san += '=' + PROMOTION_LETTERS[move_promotion(move)].upper()
+
+        else:
+            letter = FEN_LETTERS[piece.__class__].upper()
+
+            # Other pieces of the same kind that can reach the same square
+            rivals = [move_squares(other) for other in board.legal_moves(board.white_to_move)
+                      if move_to(other) == move_to(move) and move_from(other) != move_from(move)]
+            rivals = [other for other in rivals if board.board[other[0]][other[1]].__class__ is piece.__class__]
+
+            origin = ''
+            if rivals:
+                if all(other[1] != init_file for other in rivals):
+                    origin = 'abcdefgh'[init_file]
+                elif all(other[0] != init_rank for other in rivals):
+                    origin = str(8 - init_rank)
+                else:
+                    origin = 'abcdefgh'[init_file] + str(8 - init_rank)
+
+            san = letter + origin + ('x' if capture else '') + destination
+
+    # Check and checkmate
+    board.make(move)
+    if board.white_to_move:
+        in_check = board.white_in_check()
+    else:
+        in_check = board.black_in_check()
+    if in_check:
+        san += '#' if not board.legal_moves(board.white_to_move) else '+'
+    board.unmove()
+
+    return san
+
+# Validation
+class PGNReplayer:
+    """ Replays every game of a PGN stream through Board.move and keeps
+        throughput statistics. """
+
+    def __init__(self):
+        """ Replayer constructor. """
+
+        self.games = 0
+        self.plies = 0
+        self.errors = 0
+        self.seconds = 0
+
+    def replay(self, games):
+        """ Yield (game, board, error) for each game, where error is None or
+            the ValueError raised by an unreadable FEN header or the first
+            illegal move. """
+
+        start = time.perf_counter()
+
+        for game in games:
+            board, error = None, None
+
+            try:
+                board = game.replay()
+                self.plies += len(game.moves)
+            except ValueError as exception:
+                error = exception
+                self.errors += 1
+
+            self.games += 1
+            self.seconds = time.perf_counter() - start
+
+            yield game, board, error
+
+            # Time spent by the consumer is not ours
+            start = time.perf_counter() - self.seconds
+
+    def games_per_second(self):
+        """ Return games replayed per second. """
+
+        return self.games / max(self.seconds, 1e-9)
+
+    def plies_per_second(self):
+        """ Return plies replayed per second. """
+
+        return self.plies / max(self.seconds, 1e-9)
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Replay and validate the games of a PGN file.')
+    parser.add_argument('path', help='PGN file')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args(argv)
+
+    replayer = PGNReplayer()
+
+    for game, board, error in replayer.replay(open_games(args.path)):
+        if error and not args.quiet:
+            print('game %d (%s vs %s): %s' % (replayer.games, game.headers.get('White', '?'),
+                                              game.headers.get('Black', '?'), error))
+
+    print('%d games, %d plies, %d invalid, %.2fs, %.1f games/s, %.0f plies/s'
+          % (replayer.games, replayer.plies, replayer.errors, replayer.seconds,
+             replayer.games_per_second(), replayer.plies_per_second()))
+
+    return 1 if replayer.errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
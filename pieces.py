@@ -1,8 +1,35 @@
-from board import *
+from bitboard import *
+from sliders import *
+from squares import *
+from moves import *
+
+# Piece codes
+# Every piece class carries a small integer code: its type plus BLACK for
+# black pieces. Board.move and the move generators tell special pieces
+# apart by comparing codes rather than looking at classes, e.g.
+#   piece.code == BLACK_PAWN        piece.kind == KING
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+ROOK = 4
+QUEEN = 5
+KING = 6
+
+WHITE = 0
+BLACK = 8
+
+WHITE_PAWN = WHITE | PAWN
+BLACK_PAWN = BLACK | PAWN
+WHITE_KING = WHITE | KING
+BLACK_KING = BLACK | KING
 
 class Piece:
     """ Parent class for chess pieces. """
 
+    # Pieces are created by the dozen and live as long as the board, so
+    # they carry fixed slots rather than a per-instance __dict__.
+    __slots__ = ('rank', 'file', 'value', 'is_white')
+
     def __init__(self):
         """ Object instance constructor. """
 
@@ -10,10 +37,50 @@ class Piece:
         self.rank = None
         self.file = None
 
+    def vision(self, board):
+        """ Return squares the piece attacks or defends as (rank, file) pairs.
+            NOTE: The list is shared between calls and must not be modified. """
+
+        return squares(self.attacks(board))
+
+    def own_occupied(self, board):
+        """ Return the bitboard of squares occupied by this piece's side. """
+
+        if self.is_white:
+            return board.white_occupied
+        else:
+            return board.black_occupied
+
+    def target_moves(self, board, targets):
+        """ Return the moves from this piece's square to each of the target
+            squares, flagging those that capture. """
+
+        origin = self.rank * 8 + self.file
+        enemy = board.occupied ^ self.own_occupied(board)
+
+        return [origin | to_sq << 6 for to_sq in square_indices(targets & ~enemy)] \
+            + [origin | to_sq << 6 | CAPTURE for to_sq in square_indices(targets & enemy)]
+
+    def captures(self, board):
+        """ Return the moves of the piece that capture or promote.
+            Together with quiets() these are the piece's moves(), split so
+            that a staged move picker can generate the quiet moves only if
+            it gets that far. """
+
+        return self.target_moves(board, self.attacks(board) & (board.occupied ^ self.own_occupied(board)))
+
+    def quiets(self, board):
+        """ Return the moves of the piece that neither capture nor promote. """
+
+        return self.target_moves(board, self.attacks(board) & ~board.occupied)
+
 # Pawns
 class Pawn(Piece):
     """ Pawn parent class. """
 
+    __slots__ = ()
+    kind = PAWN
+
     def __init__(self):
         """ Pawn constructor. """
 
@@ -22,9 +89,23 @@ class Pawn(Piece):
         # Pawns worth 1 point
         self.value = 1
 
+    def captures(self, board):
+        """ Return the moves of the pawn that capture or promote. """
+
+        # Pawns capture where they do not move, so split their full move list
+        return [move for move in self.moves(board) if move & CAPTURE or move_promotion(move)]
+
+    def quiets(self, board):
+        """ Return the moves of the pawn that neither capture nor promote. """
+
+        return [move for move in self.moves(board) if not (move & CAPTURE or move_promotion(move))]
+
 class WhitePawn(Pawn):
     """ White pawn class. """
 
+    __slots__ = ()
+    code = WHITE | PAWN
+
     def __init__(self, file):
         """ White pawn constructor. """
 
@@ -44,78 +125,69 @@ class WhitePawn(Pawn):
 
         return '♟︎'
 
-    def vision(self, board):
-        """ Return squares white pawn attacks or defends. """
-
-        vision = []
-
-        # Diagonal left
-        if 0 <= self.rank - 1 and 0 <= self.file - 1:
-            vision += [[self.rank - 1, self.file - 1]]
-
-        # Diagonal right
-        if 0 <= self.rank - 1 and self.file + 1 <= 7:
-            vision += [[self.rank - 1, self.file + 1]]
+    def attacks(self, board):
+        """ Return bitboard of squares white pawn attacks or defends. """
 
-        return vision
+        # Diagonal left and diagonal right, looked up in a precomputed table
+        return WHITE_PAWN_ATTACKS[self.rank * 8 + self.file]
 
     def moves(self, board):
-        """ Return each of the moves a pawn can make. 
-            Format: [piece, current rank, current file, resulting piece, new rank, new file]. """
+        """ Return each of the moves a pawn can make as packed moves (see moves.py). """
 
         moves = []
-        vision = self.vision(board)
+        attacks = self.attacks(board)
+        origin = self.rank * 8 + self.file
 
         # Diagonal captures (possibility of promotion)
-        for square in vision:
-            if board.board[square[0]][square[1]] != None:
-                if not board.board[square[0]][square[1]].is_white:
-                    # Capture: promotion
-                    if self.rank - 1 == 0:
-                        for choice in [WhiteKnight, WhiteBishop, WhiteRook, WhiteQueen]:
-                            promoted_piece = choice(square[0], square[1])
-                            moves += [[self.rank, self.file, square[0], square[1], promoted_piece]]
-                    # Capture: regular
-                    else:
-                        moves += [[self.rank, self.file, square[0], square[1], None]]
+        for to_sq in square_indices(attacks & board.black_occupied):
+            # Capture: promotion
+            if to_sq < 8:
+                for promotion in PROMOTIONS:
+                    moves += [pack_move(origin, to_sq, promotion, CAPTURE)]
+            # Capture: regular
+            else:
+                moves += [pack_move(origin, to_sq, 0, CAPTURE)]
 
         # Two-square starting move
-        if self.rank == 6 and board.board[4][self.file] == None and board.board[5][self.file] == None:
-            moves += [[self.rank, self.file, self.rank - 2, self.file, None]]
+        if self.rank == 6 and not board.occupied & (bit(4, self.file) | bit(5, self.file)):
+            moves += [pack_move(origin, origin - 16, 0, DOUBLE_PUSH)]
 
         # One-square advance (possibility of promotion)
-        if board.board[self.rank - 1][self.file] == None:
+        if not board.occupied & bit(self.rank - 1, self.file):
 
             # Advance: promotion
             if self.rank - 1 == 0:
-                for choice in [WhiteKnight, WhiteBishop, WhiteRook, WhiteQueen]:
-                    promoted_piece = choice(square[0], square[1])
-                    moves += [[self.rank, self.file, self.rank - 1, self.file, promoted_piece]]
+                for promotion in PROMOTIONS:
+                    moves += [pack_move(origin, origin - 8, promotion)]
 
             # Advance: regular
             else:
-                moves += [[self.rank, self.file, self.rank - 1, self.file, None]]
+                moves += [pack_move(origin, origin - 8)]
 
         # En passant
         # Check that white pawn is on correct rank for en passant capture
-        if self.rank == 3:
+        # and that a move has been played
+        if self.rank == 3 and board.moves:
             # Check that a black pawn moved previously
-            if board.moves[-1][0].__class__.__name__ == 'BlackPawn':
+            if board.moves[-1][0].code == BLACK_PAWN:
                 # Check that the black pawn advanced two squares
                 if abs(board.moves[-1][1] - board.moves[-1][3]) == 2:
                     # Check that the square the black pawn moved through is in this pawn's vision
-                    if [board.moves[-1][3] - 1, board.moves[-1][4]] in self.vision(board):
-                        moves += [[self.rank, self.file, board.moves[-1][3] - 1, board.moves[-1][4], None]]
-
+                    if attacks & bit(board.moves[-1][3] - 1, board.moves[-1][4]):
+                        moves += [pack_move(origin, square(board.moves[-1][3] - 1, board.moves[-1][4]), 0,
+                                            CAPTURE | EN_PASSANT)]
 
         return moves
 
 class BlackPawn(Pawn):
     """ Black pawn class. """
 
+    __slots__ = ()
+    code = BLACK | PAWN
+
     def __init__(self, file):
         """ Black pawn constructor. """
-        
+
         super().__init__()
         self.rank = 1
         self.file = file
@@ -126,68 +198,56 @@ class BlackPawn(Pawn):
 
         return '♙'
 
-    def vision(self, board):
-        """ Return squares black pawn attacks or defends. """
-
-        vision = []
-
-        # Diagonal left
-        if self.rank + 1 <= 7 and 0 <= self.file - 1:
-            vision += [[self.rank + 1, self.file - 1]]
-
-        # Diagonal right
-        if self.rank + 1 <= 7 and self.file + 1 <= 7:
-            vision += [[self.rank + 1, self.file + 1]]
+    def attacks(self, board):
+        """ Return bitboard of squares black pawn attacks or defends. """
 
-        return vision
+        return BLACK_PAWN_ATTACKS[self.rank * 8 + self.file]
 
     def moves(self, board):
-        """ Return each of the moves a pawn can make. 
-            Format: [piece, current rank, current file, resulting piece, new rank, new file]. """
+        """ Return each of the moves a pawn can make as packed moves (see moves.py). """
 
         moves = []
-        vision = self.vision(board)
+        attacks = self.attacks(board)
+        origin = self.rank * 8 + self.file
 
         # Diagonal captures (possibility of promotion)
-        for square in vision:
-            if board.board[square[0]][square[1]] != None:
-                if board.board[square[0]][square[1]].is_white:
-                    # Capture: promotion
-                    if self.rank + 1 == 7:
-                        for choice in [BlackKnight, BlackBishop, BlackRook, BlackQueen]:
-                            promoted_piece = choice(square[0], square[1])
-                            moves += [[self.rank, self.file, square[0], square[1], promoted_piece]]
-                    # Capture: regular
-                    else:
-                        moves += [[self.rank, self.file, square[0], square[1], None]]
+        for to_sq in square_indices(attacks & board.white_occupied):
+            # Capture: promotion
+            if to_sq >= 56:
+                for promotion in PROMOTIONS:
+                    moves += [pack_move(origin, to_sq, promotion, CAPTURE)]
+            # Capture: regular
+            else:
+                moves += [pack_move(origin, to_sq, 0, CAPTURE)]
 
         # Two-square starting move
-        if self.rank == 1 and board.board[3][self.file] == None and board.board[2][self.file] == None:
-            moves += [[self.rank, self.file, self.rank + 2, self.file, None]]
+        if self.rank == 1 and not board.occupied & (bit(2, self.file) | bit(3, self.file)):
+            moves += [pack_move(origin, origin + 16, 0, DOUBLE_PUSH)]
 
         # One-square advance (possibility of promotion)
-        if board.board[self.rank + 1][self.file] == None:
+        if not board.occupied & bit(self.rank + 1, self.file):
 
             # Advance: promotion
             if self.rank + 1 == 7:
-                for choice in [BlackKnight, BlackBishop, BlackRook, BlackQueen]:
-                    promoted_piece = choice(square[0], square[1])
-                    moves += [[self.rank, self.file, self.rank + 1, self.file, promoted_piece]]
+                for promotion in PROMOTIONS:
+                    moves += [pack_move(origin, origin + 8, promotion)]
 
             # Advance: regular
             else:
-                moves += [[self.rank, self.file, self.rank + 1, self.file, None]]
+                moves += [pack_move(origin, origin + 8)]
 
         # En passant
-        # Check that white pawn is on correct rank for en passant capture
-        if self.rank == 4:
-            # Check that a black pawn moved previously
-            if board.moves[-1][0].__class__.__name__ == 'WhitePawn':
-                # Check that the black pawn advanced two squares
+        # Check that black pawn is on correct rank for en passant capture
+        # and that a move has been played
+        if self.rank == 4 and board.moves:
+            # Check that a white pawn moved previously
+            if board.moves[-1][0].code == WHITE_PAWN:
+                # Check that the white pawn advanced two squares
                 if abs(board.moves[-1][3] - board.moves[-1][1]) == 2:
-                    # Check that the square the black pawn moved through is in this pawn's vision
-                    if [board.moves[-1][3] + 1, board.moves[-1][4]] in self.vision(board):
-                        moves += [[self.rank, self.file, board.moves[-1][3] + 1, board.moves[-1][4], None]]
+                    # Check that the square the white pawn moved through is in this pawn's vision
+                    if attacks & bit(board.moves[-1][3] + 1, board.moves[-1][4]):
+                        moves += [pack_move(origin, square(board.moves[-1][3] + 1, board.moves[-1][4]), 0,
+                                            CAPTURE | EN_PASSANT)]
 
         return moves
 
@@ -195,6 +255,9 @@ class BlackPawn(Pawn):
 class Knight(Piece):
     """ Knight parent class. """
 
+    __slots__ = ()
+    kind = KNIGHT
+
     def __init__(self, rank, file):
         """ Knight constructor. """
 
@@ -205,58 +268,26 @@ class Knight(Piece):
         # Knights worth 3
         self.value = 3
 
-    def vision(self, board):
-        """ Return squares knight attacks/defends.
+    def attacks(self, board):
+        """ Return bitboard of squares knight attacks/defends.
             Knights jump in Ls. """
 
-        vision = []
-
-        # Check all squares a knight's L away from its present square
-        if 0 <= self.rank - 2 <= 7 and 0 <= self.file - 1 <= 7:
-            vision += [[self.rank - 2, self.file - 1]]
-
-        if 0 <= self.rank + 2 <= 7 and 0 <= self.file - 1 <= 7:
-            vision += [[self.rank + 2, self.file - 1]]
-
-        if 0 <= self.rank - 2 <= 7 and 0 <= self.file + 1 <= 7:
-            vision += [[self.rank - 2, self.file + 1]]
-
-        if 0 <= self.rank + 2 <= 7 and 0 <= self.file + 1 <= 7:
-            vision += [[self.rank + 2, self.file + 1]]
-
-        if 0 <= self.rank - 1 <= 7 and 0 <= self.file - 2 <= 7:
-            vision += [[self.rank - 1, self.file - 2]]
-
-        if 0 <= self.rank - 1 <= 7 and 0 <= self.file + 2 <= 7:
-            vision += [[self.rank - 1, self.file + 2]]
-
-        if 0 <= self.rank + 1 <= 7 and 0 <= self.file + 2 <= 7:
-            vision += [[self.rank + 1, self.file + 2]]
-
-        if 0 <= self.rank + 1 <= 7 and 0 <= self.file - 2 <= 7:
-            vision += [[self.rank + 1, self.file - 2]]
-
-        return vision
+        # All squares a knight's L away from its present square are precomputed
+        return KNIGHT_ATTACKS[self.rank * 8 + self.file]
 
     def moves(self, board):
         """ Return a list of moves a knight can make. """
 
-        moves = []
-
-        # Loop through all squares in the knight's vision and add any squares
-        # that are unoccupied or occupied by pieces of the opposite color
-        for square in self.vision(board):
-            if not board.board[square[0]][square[1]]:
-                moves += [[self.rank, self.file, square[0], square[1], None]]
-            else:
-                if board.board[square[0]][square[1]].is_white != self.is_white:
-                    moves += [[self.rank, self.file, square[0], square[1], None]]
-
-        return moves
+        # Every square in the knight's vision that is unoccupied or
+        # occupied by a piece of the opposite color
+        return self.target_moves(board, self.attacks(board) & ~self.own_occupied(board))
 
 class WhiteKnight(Knight):
     """ White knight class. """
 
+    __slots__ = ()
+    code = WHITE | KNIGHT
+
     def __init__(self, rank, file):
         """ White knight constructor. """
 
@@ -271,6 +302,9 @@ class WhiteKnight(Knight):
 class BlackKnight(Knight):
     """ Black knight class. """
 
+    __slots__ = ()
+    code = BLACK | KNIGHT
+
     def __init__(self, rank, file):
         """ Black knight constructor. """
 
@@ -286,6 +320,9 @@ class BlackKnight(Knight):
 class Bishop(Piece):
     """ Bishop parent class. """
 
+    __slots__ = ()
+    kind = BISHOP
+
     def __init__(self, rank, file):
         """ Bishop constructor. """
 
@@ -296,105 +333,25 @@ class Bishop(Piece):
         # Bishops worth 3
         self.value = 3
 
-    def vision(self, board):
-        """ Return squares bishop attacks/defends.
-            Bishops move along diagonals. """
-
-        vision = []
-
-        # Store current rank and file in variables.
-        current_rank, current_file = self.rank, self.file
+    def attacks(self, board):
+        """ Return bitboard of squares bishop attacks/defends.
+            Bishops move along diagonals up to and including the first occupied square. """
 
-        # Check for open down-right squares.
-        # Add open squares to moves.
-        while current_rank + 1 <= 7 and current_file + 1 <= 7:
-            if not board.board[current_rank + 1][current_file + 1]:
-                vision += [[current_rank + 1, current_file + 1]]
-                current_rank += 1
-                current_file += 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece, add it to vision.
-        if current_rank + 1 <= 7 and current_file + 1 <= 7:
-            vision += [[current_rank + 1, current_file + 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open up-right squares.
-        # Add open squares to moves.
-        while current_rank - 1 >= 0 and current_file + 1 <= 7:
-            if not board.board[current_rank - 1][current_file + 1]:
-                vision += [[current_rank - 1, current_file + 1]]
-                current_rank -= 1
-                current_file += 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece of the opposite color, add it to moves.
-        if current_rank - 1 >= 0 and current_file + 1 <= 7:
-            vision += [[current_rank - 1, current_file + 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open up-left squares.
-        # Add open squares to moves.
-        while current_rank - 1 >= 0 and current_file - 1 >= 0:
-            if not board.board[current_rank - 1][current_file - 1]:
-                vision += [[current_rank - 1, current_file - 1]]
-                current_rank -= 1
-                current_file -= 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece of the opposite color, add it to moves.
-        if current_rank - 1 >= 0 and current_file - 1 >= 0:
-            vision += [[current_rank - 1, current_file - 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open down-right squares.
-        # Add open squares to moves.
-        while current_rank + 1 <= 7 and current_file - 1 >= 0:
-            if not board.board[current_rank + 1][current_file - 1]:
-                vision += [[current_rank + 1, current_file - 1]]
-                current_rank += 1
-                current_file -= 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece of the opposite color, add it to moves.
-        if current_rank + 1 <= 7 and current_file - 1 >= 0:
-            vision += [[current_rank + 1, current_file - 1]]
-
-        return vision
+        return bishop_attacks(self.rank * 8 + self.file, board.occupied)
 
     def moves(self, board):
         """ Return a list of moves a bishop can make. """
 
-        moves = []
-
-        # Loop through all squares in bishop's vision and add any squares
-        # that are unoccupied or occupied by pieces of the opposite color
-        for square in self.vision(board):
-            if not board.board[square[0]][square[1]]:
-                moves += [[self.rank, self.file, square[0], square[1], None]]
-            else:
-                if board.board[square[0]][square[1]].is_white != self.is_white:
-                    moves += [[self.rank, self.file, square[0], square[1], None]]
-
-        return moves
+        # Every square in the bishop's vision that is unoccupied or
+        # occupied by a piece of the opposite color
+        return self.target_moves(board, self.attacks(board) & ~self.own_occupied(board))
 
 class WhiteBishop(Bishop):
     """ White bishop class. """
 
+    __slots__ = ()
+    code = WHITE | BISHOP
+
     def __init__(self, rank, file):
         """ White bishop constructor. """
 
@@ -409,6 +366,9 @@ class WhiteBishop(Bishop):
 class BlackBishop(Bishop):
     """ Black bishop class. """
 
+    __slots__ = ()
+    code = BLACK | BISHOP
+
     def __init__(self, rank, file):
         """ Black bishop constructor. """
 
@@ -424,6 +384,9 @@ class BlackBishop(Bishop):
 class Rook(Piece):
     """ Rook parent class. """
 
+    __slots__ = ()
+    kind = ROOK
+
     def __init__(self, rank, file):
         """ Rook constructor. """
 
@@ -434,102 +397,25 @@ class Rook(Piece):
         # Rooks worth 5
         self.value = 5
 
-    def vision(self, board):
-        """ Return a list of squares a rook attacks/defends. 
-            Rooks move vertically and horizontally. """
-
-        vision = []
-
-        # Store current rank and file in variables.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open squares below.
-        # Add open squares to moves.
-        while current_rank + 1 <= 7:
-            if not board.board[current_rank + 1][current_file]:
-                vision += [[current_rank + 1, current_file]]
-                current_rank += 1
-            else:
-                break
-
-        # No more open squares. If the next square down is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_rank + 1 <= 7:
-            vision += [[current_rank + 1, current_file]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
+    def attacks(self, board):
+        """ Return bitboard of squares a rook attacks/defends.
+            Rooks move vertically and horizontally up to and including the first occupied square. """
 
-        # Check for open squares above.
-        # Add open squares to moves.
-        while current_rank - 1 >= 0:
-            if not board.board[current_rank - 1][current_file]:
-                vision += [[current_rank - 1, current_file]]
-                current_rank -= 1
-
-            else:
-                break
-
-        # No more open squares. If the next square up is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_rank - 1 >= 0:
-            vision += [[current_rank - 1, current_file]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open squares to the right.
-        # Add open squares to moves.
-        while current_file + 1 <= 7:
-            if not board.board[current_rank][current_file + 1]:
-                vision += [[current_rank, current_file + 1]]
-                current_file += 1
-            else:
-                break
-
-        # No more open squares. If the next square down is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_file + 1 <= 7:
-            vision += [[current_rank, current_file + 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open squares to the left.
-        # Add open squares to moves.
-        while current_file - 1 >= 0:
-            if not board.board[current_rank][current_file - 1]:
-                vision += [[current_rank, current_file - 1]]
-                current_file -= 1
-            else:
-                break
-
-        # No more open squares. If the next square down is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_file - 1 >= 0:
-                vision += [[current_rank, current_file - 1]]
-
-        return vision
+        return rook_attacks(self.rank * 8 + self.file, board.occupied)
 
     def moves(self, board):
         """ Return a list of moves a rook can make. """
 
-        moves = []
-
-        # Loop through all squares in rook's vision and add any squares
-        # that are unoccupied or occupied by pieces of the opposite color        
-        for square in self.vision(board):
-            if not board.board[square[0]][square[1]]:
-                moves += [[self.rank, self.file, square[0], square[1], None]]
-            else:
-                if board.board[square[0]][square[1]].is_white != self.is_white:
-                    moves += [[self.rank, self.file, square[0], square[1], None]]
-
-        return moves
+        # Every square in the rook's vision that is unoccupied or
+        # occupied by a piece of the opposite color
+        return self.target_moves(board, self.attacks(board) & ~self.own_occupied(board))
 
 class WhiteRook(Rook):
     """ White Rook class. """
 
+    __slots__ = ()
+    code = WHITE | ROOK
+
     def __init__(self, rank, file):
         """ White rook constructor. """
 
@@ -544,6 +430,9 @@ class WhiteRook(Rook):
 class BlackRook(Rook):
     """ Black Rook class. """
 
+    __slots__ = ()
+    code = BLACK | ROOK
+
     def __init__(self, rank, file):
         """ Black rook constructor. """
 
@@ -559,6 +448,9 @@ class BlackRook(Rook):
 class Queen(Piece):
     """ Queen parent class. """
 
+    __slots__ = ()
+    kind = QUEEN
+
     def __init__(self, rank, file):
         """ Queen constructor. """
 
@@ -569,190 +461,25 @@ class Queen(Piece):
         # Queens worth 9
         self.value = 9
 
-    def vision(self, board):
-        """ Return squares a queen attacks/defends.
+    def attacks(self, board):
+        """ Return bitboard of squares a queen attacks/defends.
             A queen moves diagonally, vertically, and horizontally. """
 
-        vision = []
-
-        #
-        #
-        # BEGIN ROOK BEHAVIOR
-
-        # Store current rank and file in variables.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open squares below.
-        # Add open squares to moves.
-        while current_rank + 1 <= 7:
-            if not board.board[current_rank + 1][current_file]:
-                vision += [[current_rank + 1, current_file]]
-                current_rank += 1
-            else:
-                break
-
-        # No more open squares. If the next square down is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_rank + 1 <= 7:
-            vision += [[current_rank + 1, current_file]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open squares above.
-        # Add open squares to moves.
-        while current_rank - 1 >= 0:
-            if not board.board[current_rank - 1][current_file]:
-                vision += [[current_rank - 1, current_file]]
-                current_rank -= 1
-
-            else:
-                break
-
-        # No more open squares. If the next square up is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_rank - 1 >= 0:
-            vision += [[current_rank - 1, current_file]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open squares to the right.
-        # Add open squares to moves.
-        while current_file + 1 <= 7:
-            if not board.board[current_rank][current_file + 1]:
-                vision += [[current_rank, current_file + 1]]
-                current_file += 1
-            else:
-                break
-
-        # No more open squares. If the next square down is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_file + 1 <= 7:
-            vision += [[current_rank, current_file + 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open squares to the left.
-        # Add open squares to moves.
-        while current_file - 1 >= 0:
-            if not board.board[current_rank][current_file - 1]:
-                vision += [[current_rank, current_file - 1]]
-                current_file -= 1
-            else:
-                break
-
-        # No more open squares. If the next square down is
-        # occupied by a piece of the opposite color, add it to moves.
-        if current_file - 1 >= 0:
-                vision += [[current_rank, current_file - 1]]       
-
-        # END ROOK BEHAVIOR
-        # 
-        #     
-
-        #
-        #
-        # BEGIN BISHOP BEHAVIOR
-
-        # Store current rank and file in variables.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open down-right squares.
-        # Add open squares to moves.
-        while current_rank + 1 <= 7 and current_file + 1 <= 7:
-            if not board.board[current_rank + 1][current_file + 1]:
-                vision += [[current_rank + 1, current_file + 1]]
-                current_rank += 1
-                current_file += 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece , add it to vision.
-        if current_rank + 1 <= 7 and current_file + 1 <= 7:
-            vision += [[current_rank + 1, current_file + 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open up-right squares.
-        # Add open squares to moves.
-        while current_rank - 1 >= 0 and current_file + 1 <= 7:
-            if not board.board[current_rank - 1][current_file + 1]:
-                vision += [[current_rank - 1, current_file + 1]]
-                current_rank -= 1
-                current_file += 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece of the opposite color, add it to moves.
-        if current_rank - 1 >= 0 and current_file + 1 <= 7:
-            vision += [[current_rank - 1, current_file + 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open up-left squares.
-        # Add open squares to moves.
-        while current_rank - 1 >= 0 and current_file - 1 >= 0:
-            if not board.board[current_rank - 1][current_file - 1]:
-                vision += [[current_rank - 1, current_file - 1]]
-                current_rank -= 1
-                current_file -= 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece of the opposite color, add it to moves.
-        if current_rank - 1 >= 0 and current_file - 1 >= 0:
-            vision += [[current_rank - 1, current_file - 1]]
-
-        # Reset current square.
-        current_rank, current_file = self.rank, self.file
-
-        # Check for open down-right squares.
-        # Add open squares to moves.
-        while current_rank + 1 <= 7 and current_file - 1 >= 0:
-            if not board.board[current_rank + 1][current_file - 1]:
-                vision += [[current_rank + 1, current_file - 1]]
-                current_rank += 1
-                current_file -= 1
-            else:
-                break
-
-        # No more open squares. If the next square along this diagonal
-        # is occupied by a piece of the opposite color, add it to moves.
-        if current_rank + 1 <= 7 and current_file - 1 >= 0:
-            vision += [[current_rank + 1, current_file - 1]]       
-        
-        # END BISHOP BEHAVIOR
-        # 
-        # 
-
-        return vision
+        return queen_attacks(self.rank * 8 + self.file, board.occupied)
 
     def moves(self, board):
         """ Return a list of move a queen can make. """
 
-        moves = []
-
-        # Loop through all squares in queen's vision and add any squares
-        # that are unoccupied or occupied by pieces of the opposite color
-        for square in self.vision(board):
-            if not board.board[square[0]][square[1]]:
-                moves += [[self.rank, self.file, square[0], square[1], None]]
-            else:
-                if board.board[square[0]][square[1]].is_white != self.is_white:
-                    moves += [[self.rank, self.file, square[0], square[1], None]]
-
-        return moves
+        # Every square in the queen's vision that is unoccupied or
+        # occupied by a piece of the opposite color
+        return self.target_moves(board, self.attacks(board) & ~self.own_occupied(board))
 
 class WhiteQueen(Queen):
     """ White queen class. """
 
+    __slots__ = ()
+    code = WHITE | QUEEN
+
     def __init__(self, rank, file):
         """ White queen constructor. """
 
@@ -767,6 +494,9 @@ class WhiteQueen(Queen):
 class BlackQueen(Queen):
     """ Black queen class. """
 
+    __slots__ = ()
+    code = BLACK | QUEEN
+
     def __init__(self, rank, file):
         """ Black queen constructor. """
 
@@ -782,6 +512,9 @@ class BlackQueen(Queen):
 class King(Piece):
     """ King parent class. """
 
+    __slots__ = ('in_check',)
+    kind = KING
+
     def __init__(self, rank, file):
         """ King constructor. """
 
@@ -792,46 +525,24 @@ class King(Piece):
         # A king has an attribute whose value reflects whether the king is in check
         self.in_check = False
 
-    def vision(self, board):
-        """ Return a list of squares a king attacks/defends.
-            Kings can see all adjacent squares, including
-            diagonal adjacencies. """
-
-        vision = []
+    def quiets(self, board):
+        """ Return the moves of the king that do not capture, castling included. """
 
-        current_rank, current_file = self.rank, self.file
+        return [move for move in self.moves(board) if not move & CAPTURE]
 
-        # Squares below
-        if current_rank < 7:
-            vision += [[current_rank + 1, current_file]]
-
-            if current_file > 0:
-                vision += [[current_rank + 1, current_file - 1]]
-            if current_file < 7:
-                vision += [[current_rank + 1, current_file + 1]]
-
-        # Squares above
-        if current_rank > 0:
-            vision += [[current_rank - 1, current_file]]
-
-            if current_file > 0:
-                vision += [[current_rank - 1, current_file - 1]]
-            if current_file < 7:
-                vision += [[current_rank - 1, current_file + 1]]
-
-        # Square to right
-        if current_file < 7:
-            vision += [[current_rank, current_file + 1]]
-        
-        # Square to left
-        if current_file > 0:
-            vision += [[current_rank, current_file - 1]]
+    def attacks(self, board):
+        """ Return bitboard of squares a king attacks/defends.
+            Kings can see all adjacent squares, including
+            diagonal adjacencies. """
 
-        return vision
+        return KING_ATTACKS[self.rank * 8 + self.file]
 
 class WhiteKing(King):
     """ White king class. """
 
+    __slots__ = ()
+    code = WHITE | KING
+
     def __init__(self, rank, file):
         """ White king constructor. """
 
@@ -846,16 +557,9 @@ class WhiteKing(King):
     def moves(self, board):
         """ Return a list of moves a white king can make. """
 
-        moves = []
-
-        # Loop through all squares in king's vision and add any squares
-        # that are unoccupied or occupied by pieces of the opposite color        
-        for square in self.vision(board):
-            if not board.board[square[0]][square[1]]:
-                moves += [[self.rank, self.file, square[0], square[1], None]]
-            else:
-                if board.board[square[0]][square[1]].is_white != self.is_white:
-                    moves += [[self.rank, self.file, square[0], square[1], None]]
+        # Every square in the king's vision that is unoccupied or
+        # occupied by a piece of the opposite color
+        moves = self.target_moves(board, self.attacks(board) & ~board.white_occupied)
 
         # Check for castling rights
         if board.white_can_castle:
@@ -868,28 +572,31 @@ class WhiteKing(King):
                 if board.board[7][7] in board.white_rooks:
 
                     # Check that the squares in between the king and rook are empty
-                    if not board.board[7][5] and not board.board[7][6]:
+                    if not BETWEEN[60][63] & board.occupied:
 
                         # Check that the king is not castling from, through, or into check
-                        if (7, 4) not in board.black_vision() and (7, 5) not in board.black_vision() and (7,6) not in board.black_vision():
-                            
+                        if not board.attacked(7, 4, False) and not board.attacked(7, 5, False) and not board.attacked(7, 6, False):
+
                             # Conditions for kingside castling have been met;
                             # include kingside castling in move list
-                            moves += [[self.rank, self.file, 7, 6, None]]
+                            moves += [pack_move(square(self.rank, self.file), 62, 0, CASTLING)]
 
             # Queenside castle
             # Same logic, mirror image
             if board.board[7][0]:
                 if board.board[7][0] in board.white_rooks:
-                    if not board.board[7][1] and not board.board[7][2] and not board.board[7][3]:
-                        if (7, 2) not in board.black_vision() and (7, 3) not in board.black_vision() and (7,4) not in board.black_vision():
-                            moves += [[self.rank, self.file, 7, 2, None]]
+                    if not BETWEEN[60][56] & board.occupied:
+                        if not board.attacked(7, 2, False) and not board.attacked(7, 3, False) and not board.attacked(7, 4, False):
+                            moves += [pack_move(square(self.rank, self.file), 58, 0, CASTLING)]
 
         return moves
 
 class BlackKing(King):
     """ Black king class. """
 
+    __slots__ = ()
+    code = BLACK | KING
+
     def __init__(self, rank, file):
         """ Black king constructor. """
 
@@ -906,14 +613,7 @@ class BlackKing(King):
 
         # See WhiteKing moves() method annotations
 
-        moves = []
-
-        for square in self.vision(board):
-            if not board.board[square[0]][square[1]]:
-                moves += [[self.rank, self.file, square[0], square[1], None]]
-            else:
-                if board.board[square[0]][square[1]].is_white != self.is_white:
-                    moves += [[self.rank, self.file, square[0], square[1], None]]
+        moves = self.target_moves(board, self.attacks(board) & ~board.black_occupied)
 
         # Check for castling
         if board.black_can_castle:
@@ -922,15 +622,19 @@ class BlackKing(King):
             # Kingside castle
             if board.board[0][7]:
                 if board.board[0][7] in board.black_rooks:
-                    if not board.board[0][5] and not board.board[0][6]:
-                        if (0, 4) not in board.white_vision() and (0, 5) not in board.white_vision() and (0,6) not in board.white_vision():
-                            moves += [[self.rank, self.file, 0, 6, None]]
+                    if not BETWEEN[4][7] & board.occupied:
+                        if not board.attacked(0, 4, True) and not board.attacked(0, 5, True) and not board.attacked(0, 6, True):
+                            moves += [pack_move(square(self.rank, self.file), 6, 0, CASTLING)]
 
             # Queenside
             if board.board[0][0]:
                 if board.board[0][0] in board.black_rooks:
-                    if not board.board[0][1] and not board.board[0][2] and not board.board[0][3]:
-                        if (0, 2) not in board.white_vision() and (0, 3) not in board.white_vision() and (0,4) not in board.white_vision():
-                            moves += [[self.rank, self.file, 0, 2, None]]
+                    if not BETWEEN[4][0] & board.occupied:
+                        if not board.attacked(0, 2, True) and not board.attacked(0, 3, True) and not board.attacked(0, 4, True):
+                            moves += [pack_move(square(self.rank, self.file), 2, 0, CASTLING)]
+
+        return moves
 
-        return moves
\ No newline at end of file
+# Promoted piece classes by promotion code (see moves.py), for each color
+PROMOTION_PIECES = {True: [None, WhiteKnight, WhiteBishop, WhiteRook, WhiteQueen],
+                    False: [None, BlackKnight, BlackBishop, BlackRook, BlackQueen]}
@@ -1,5 +1,36 @@
+import argparse
+
 from board import *
 from pieces import *
+from engine import Engine
+from book import OpeningBook
+from perft import move_name
+
+def engine_move(board, engine):
+    """ Play the engine's move for the side to move, from the book when
+        the position is in it. Return False if the game is over instead. """
+
+    if board.announce_result():
+        return False
+
+    if board.white_to_move:
+        in_check = board.white_in_check()
+    else:
+        in_check = board.black_in_check()
+
+    if in_check:
+        print('Check.')
+
+    move, score = engine.search(board)
+
+    if engine.depth == 0:
+        print('Engine plays %s (book).' % move_name(move))
+    else:
+        print('Engine plays %s.' % move_name(move))
+
+    board.make(move)
+
+    return True
 
 # Initialize board.
 board = Board()
@@ -96,20 +127,38 @@ bk = BlackKing(0, 4)
 board.init_piece(bk, False)
 board.black_king = bk
 
+# Command line: optionally let the engine reply for one side
+parser = argparse.ArgumentParser(description='Play chess in the terminal.')
+parser.add_argument('--reply', choices=['white', 'black'], help='side the engine plays')
+parser.add_argument('--book', help='opening book file for the engine (see book.py)')
+parser.add_argument('--time', type=float, default=2.0, help='engine time per move in seconds (default: 2)')
+args = parser.parse_args()
+
+engine = None
+if args.reply:
+    book = OpeningBook(args.book) if args.book else None
+    engine = Engine(time_limit=args.time, book=book)
+
 print('----------------------------------------')
 print('Welcome to Python chess in the terminal.')
 print()
 print('Enter moves as initial square/end square pairs, e.g. e2 e4')
 
-# Loop until checkmate or stalemate, in which case
+# Loop until checkmate, stalemate, or a draw, in which case
 # process_color() will return False and the program will end.
 while True:
 
     board.print_board()
-    if not board.process_white():
+    if args.reply == 'white':
+        if not engine_move(board, engine):
+            break
+    elif not board.process_white():
         break
 
     board.print_board()
-    if not board.process_black():
+    if args.reply == 'black':
+        if not engine_move(board, engine):
+            break
+    elif not board.process_black():
         break
 
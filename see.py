@@ -0,0 +1,106 @@
+from bitboard import *
+from sliders import *
+from pieces import *
+from moves import *
+
+# Static exchange evaluation
+# SEE works out what a capture wins once every piece bearing on the
+# target square has joined in, without playing any move: the two sides
+# take turns recapturing with their least valuable attacker, and either
+# side may stop capturing when going on would lose material.
+# The attackers and defenders of the square come from the board's attack
+# maps, which the pieces' vision() keeps up to date. Each capture empties
+# a square, and a bishop, rook or queen behind it may then join in along
+# the same line. These x-ray attackers are found with the slider lookups.
+
+# Piece values by kind, in centipawns. The king is worth more than all the
+# rest together, so it only ever captures last.
+SEE_VALUES = [0, 100, 320, 330, 500, 900, 20000]
+
+# Piece classes by color and kind, for finding the least valuable attacker
+SEE_CLASSES = {True: [None, WhitePawn, WhiteKnight, WhiteBishop, WhiteRook, WhiteQueen, WhiteKing],
+               False: [None, BlackPawn, BlackKnight, BlackBishop, BlackRook, BlackQueen, BlackKing]}
+
+def see(board, move):
+    """ Return the material the side making a capture or promotion wins
+        from the exchange on the destination square, in centipawns. Pins
+        are not taken into account. """
+
+    from_sq = move & 63
+    to_sq = (move >> 6) & 63
+    to_rank, to_file = to_sq >> 3, to_sq & 7
+
+    piece = board.board[from_sq >> 3][from_sq & 7]
+    victim = board.board[to_rank][to_file]
+    occupied = board.occupied ^ (1 << from_sq)
+
+    # En passant takes a pawn from beside the destination square
+    if move & EN_PASSANT:
+        occupied ^= 1 << ((from_sq & ~7) | to_file)
+        gain = SEE_VALUES[PAWN]
+    elif victim:
+        gain = SEE_VALUES[victim.kind]
+    else:
+        gain = 0
+
+    # The piece standing on the square after the move, there to be recaptured
+    promotion = move_promotion(move)
+    if promotion:
+        gain += SEE_VALUES[promotion + 1] - SEE_VALUES[PAWN]
+        on_square = SEE_VALUES[promotion + 1]
+    else:
+        on_square = SEE_VALUES[piece.kind]
+
+    bitboards = board.bitboards
+    diagonal = bitboards[WhiteBishop] | bitboards[BlackBishop] | bitboards[WhiteQueen] | bitboards[BlackQueen]
+    straight = bitboards[WhiteRook] | bitboards[BlackRook] | bitboards[WhiteQueen] | bitboards[BlackQueen]
+
+    # Both sides' pieces that see the square, plus sliders uncovered by the move
+    attackers = 0
+    for attacker in board.attackers[to_rank][to_file]:
+        attackers |= 1 << (attacker.rank * 8 + attacker.file)
+
+    attackers = (attackers
+                 | (bishop_attacks(to_sq, occupied) & diagonal)
+                 | (rook_attacks(to_sq, occupied) & straight)) & occupied
+
+    # gains[n] is the balance of the exchange for the side making capture n,
+    # should the other side not recapture
+    gains = [gain]
+    is_white = not piece.is_white
+
+    while True:
+        if is_white:
+            own = attackers & board.white_occupied
+        else:
+            own = attackers & board.black_occupied
+
+        if not own:
+            break
+
+        # Recapture with the least valuable attacker
+        for kind in [PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING]:
+            candidates = own & bitboards[SEE_CLASSES[is_white][kind]]
+            if candidates:
+                break
+
+        # The king may not capture onto a square the other side still attacks
+        if kind == KING and attackers & ~own:
+            break
+
+        gains += [on_square - gains[-1]]
+        on_square = SEE_VALUES[kind]
+
+        occupied ^= candidates & -candidates
+        attackers = (attackers
+                     | (bishop_attacks(to_sq, occupied) & diagonal)
+                     | (rook_attacks(to_sq, occupied) & straight)) & occupied
+
+        is_white = not is_white
+
+    # Each side stops capturing where going on would lose
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = min(gains[-1], -last)
+
+    return gains[0]
@@ -0,0 +1,519 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import math
+import random
+import sys
+import time
+
+from board import *
+from pieces import *
+from engine import Engine
+from perft import move_name
+from batch import check_position
+
+# Game server
+# One process hosts any number of games, each on its own Board, for any
+# number of clients. Clients connect over TCP or a Unix socket and speak a
+# line protocol. Game ids are chosen by the client; every reply starts with
+# the id of the game it concerns, so a client may play many games over one
+# connection and have requests for different games outstanding at once.
+#
+#   new <game> [<fen>]      -> <game> ok <status> <fen>
+#   move <game> <move>      -> <game> ok <status> <fen>        (e.g. e2e4, e7e8q)
+#   moves <game>            -> <game> moves <move> ...
+#   go <game> [<depth>]     -> <game> bestmove <move> <status> <fen>   (depth at most --max-depth)
+#   show <game>             -> <game> ok <status> <fen>
+#   stats [<game>]          -> <game> stats ...   or   * stats ...
+#   close <game>            -> <game> closed
+# Errors are answered as  <game> error <message>.  The status is ongoing,
+# checkmate, stalemate, repetition, fifty-move or insufficient-material.
+#
+# The event loop only reads, dispatches and writes. Move validation runs on
+# a thread pool, and engine searches, which take far longer, on a process
+# pool, so no request ever holds up the others. Requests for the same game
+# are answered one at a time, in order.
+
+DEFAULT_PORT = 7777
+
+# Deepest search a client may ask go for. The search processes are shared
+# by every game, so one very deep search would hold up all the others.
+MAX_DEPTH = 6
+
+# Latencies are counted in buckets growing by LATENCY_STEP from
+# LATENCY_FLOOR seconds, so percentiles cover every request in fixed memory
+# and are accurate to within a step
+LATENCY_FLOOR = 1e-5
+LATENCY_STEP = 1.05
+
+class LatencyStats:
+    """ Request latencies: running totals and a histogram. """
+
+    def __init__(self):
+        """ Latency statistics constructor. """
+
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = collections.Counter()
+
+    def add(self, seconds):
+        """ Record one request's latency. """
+
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[max(0, int(math.log(max(seconds, LATENCY_FLOOR) / LATENCY_FLOOR, LATENCY_STEP)))] += 1
+
+    def percentile(self, fraction):
+        """ Return the latency below which the given fraction of the requests fall. """
+
+        remaining = fraction * self.count
+
+        for bucket in sorted(self.buckets):
+            remaining -= self.buckets[bucket]
+            if remaining <= 0:
+                return min(LATENCY_FLOOR * LATENCY_STEP ** (bucket + 1), self.max)
+
+        return self.max
+
+    def summary(self):
+        """ Return the statistics as protocol text, in milliseconds. """
+
+        return 'requests %d mean %.2fms p50 %.2fms p99 %.2fms max %.2fms' \
+            % (self.count, 1000 * self.total / max(self.count, 1),
+               1000 * self.percentile(0.5), 1000 * self.percentile(0.99), 1000 * self.max)
+
+class GameSession:
+    """ One hosted game. """
+
+    def __init__(self, game_id, board, fen):
+        """ Game session constructor. """
+
+        self.game_id = game_id
+        self.board = board
+
+        # Starting position and moves played, from which a search process
+        # sets up the game with its history
+        self.fen = fen
+        self.moves = []
+
+        # Held while a request works on the board
+        self.lock = asyncio.Lock()
+
+        self.latency = LatencyStats()
+
+# Statuses of games drawn by rule, by their Board.game_result() reason
+DRAW_STATUSES = {'threefold repetition': 'repetition',
+                 'the fifty-move rule': 'fifty-move',
+                 'insufficient material': 'insufficient-material'}
+
+# Work done off the event loop
+def game_status(board):
+    """ Return whether the game on the board is ongoing or how it ended. """
+
+    ended = board.game_result()
+    if not ended:
+        return 'ongoing'
+
+    result, reason = ended
+
+    return DRAW_STATUSES.get(reason, reason)
+
+def read_position(fen):
+    """ Return a board set up from a FEN. Raise ValueError if the FEN cannot
+        be read or the position could not arise in a game. """
+
+    try:
+        board = Board.from_fen(fen)
+    except (KeyError, IndexError, AttributeError):
+        raise ValueError('unreadable position %s' % fen)
+
+    check_position(board)
+
+    return board
+
+def position_text(board):
+    """ Return '<status> <fen>' for the board. """
+
+    return '%s %s' % (game_status(board), board.to_fen())
+
+def play_move(board, name):
+    """ Play a move given in coordinate notation and return the new
+        position_text(). Raise ValueError if the move is not legal. """
+
+    board.make(find_move(board, name))
+
+    return position_text(board)
+
+def find_move(board, name):
+    """ Return the legal move named in coordinate notation. Raise ValueError if there is none. """
+
+    for move in board.legal_moves(board.white_to_move):
+        if move_name(move) == name:
+            return move
+
+    raise ValueError('illegal move %s' % name)
+
+def legal_move_names(board):
+    """ Return the legal moves of the side to move in coordinate notation. """
+
+    return [move_name(move) for move in board.legal_moves(board.white_to_move)]
+
+# Each search process keeps one engine, and so one transposition table
+search_worker = {}
+
+def init_search_worker(hash_mb):
+    """ Set up a search process. """
+
+    search_worker['engine'] = Engine(hash_mb=hash_mb)
+
+def search_position(fen, moves, depth):
+    """ Return the engine's move after the given moves from a position,
+        in coordinate notation. Replaying the moves gives the engine the
+        history it needs to see repetitions. """
+
+    engine = search_worker['engine']
+    engine.max_depth = depth
+
+    board = Board.from_fen(fen)
+    for name in moves:
+        board.make(find_move(board, name))
+
+    best_move, score = engine.search(board)
+
+    return move_name(best_move)
+
+class GameServer:
+    """ Hosts games for clients speaking the line protocol (see above). """
+
+    def __init__(self, search_workers=1, depth=3, hash_mb=16, max_depth=MAX_DEPTH):
+        """ Game server constructor. """
+
+        self.max_depth = max_depth
+        self.depth = min(depth, max_depth)
+        self.games = {}
+        self.latency = LatencyStats()
+
+        # One validation thread: only one thread runs Python code at a time,
+        # and more of them would only take turns with the event loop
+        self.threads = concurrent.futures.ThreadPoolExecutor(1)
+        self.searchers = concurrent.futures.ProcessPoolExecutor(search_workers, initializer=init_search_worker,
+                                                                initargs=(hash_mb,))
+
+        self.handlers = {'new': self.handle_new,
+                         'move': self.handle_move,
+                         'moves': self.handle_moves,
+                         'go': self.handle_go,
+                         'show': self.handle_show,
+                         'stats': self.handle_stats,
+                         'close': self.handle_close}
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        """ Accept connections until cancelled. """
+
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """ Shut down the worker pools. """
+
+        self.threads.shutdown()
+        self.searchers.shutdown()
+
+    async def handle_client(self, reader, writer):
+        """ Answer one connection's requests, each in its own task. """
+
+        tasks = set()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            task = asyncio.create_task(self.respond(line.decode().split(), writer))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.wait(tasks)
+
+        writer.close()
+
+    async def respond(self, words, writer):
+        """ Answer one request and record its latency. """
+
+        start = time.perf_counter()
+
+        if not words:
+            return
+
+        game_id = words[1] if len(words) > 1 else '*'
+
+        if words[0] not in self.handlers:
+            reply = '%s error unknown command %s' % (game_id, words[0])
+        else:
+            # Any failure is answered, or the client would wait for ever
+            try:
+                reply = await self.handlers[words[0]](game_id, words[2:])
+            except Exception as error:
+                reply = '%s error %s' % (game_id, str(error) or type(error).__name__)
+
+        writer.write((reply + '\n').encode())
+        await writer.drain()
+
+        seconds = time.perf_counter() - start
+        self.latency.add(seconds)
+        if game_id in self.games:
+            self.games[game_id].latency.add(seconds)
+
+    def session(self, game_id):
+        """ Return the session of a game. Raise ValueError if there is none. """
+
+        if game_id not in self.games:
+            raise ValueError('no game %s' % game_id)
+
+        return self.games[game_id]
+
+    async def run_in_thread(self, function, *args):
+        """ Run a function on the thread pool and return its result. """
+
+        return await asyncio.get_running_loop().run_in_executor(self.threads, function, *args)
+
+# Commands
+    async def handle_new(self, game_id, args):
+        """ Start a game, from the start position unless a FEN is given. """
+
+        if game_id == '*' or game_id in self.games:
+            raise ValueError('game %s exists' % game_id)
+
+        fen = ' '.join(args) if args else START_FEN
+        board = await self.run_in_thread(read_position, fen)
+
+        # The game is registered only once everything about it has worked,
+        # so a failure never leaves its id taken
+        text = await self.run_in_thread(position_text, board)
+
+        # A race with another new for the same id
+        if game_id in self.games:
+            raise ValueError('game %s exists' % game_id)
+
+        self.games[game_id] = GameSession(game_id, board, fen)
+
+        return '%s ok %s' % (game_id, text)
+
+    async def handle_move(self, game_id, args):
+        """ Play a move. """
+
+        session = self.session(game_id)
+
+        async with session.lock:
+            text = await self.run_in_thread(play_move, session.board, args[0])
+            session.moves += [args[0]]
+
+            return '%s ok %s' % (game_id, text)
+
+    async def handle_moves(self, game_id, args):
+        """ List the legal moves. """
+
+        session = self.session(game_id)
+
+        async with session.lock:
+            return '%s moves %s' % (game_id, ' '.join(await self.run_in_thread(legal_move_names, session.board)))
+
+    async def handle_go(self, game_id, args):
+        """ Let the engine play a move. """
+
+        session = self.session(game_id)
+        depth = min(max(int(args[0]), 1), self.max_depth) if args else self.depth
+
+        async with session.lock:
+            if await self.run_in_thread(game_status, session.board) != 'ongoing':
+                raise ValueError('game over')
+
+            loop = asyncio.get_running_loop()
+            name = await loop.run_in_executor(self.searchers, search_position, session.fen, session.moves, depth)
+            text = await self.run_in_thread(play_move, session.board, name)
+            session.moves += [name]
+
+            return '%s bestmove %s %s' % (game_id, name, text)
+
+    async def handle_show(self, game_id, args):
+        """ Show the position. """
+
+        session = self.session(game_id)
+
+        async with session.lock:
+            return '%s ok %s' % (game_id, await self.run_in_thread(position_text, session.board))
+
+    async def handle_stats(self, game_id, args):
+        """ Report a game's request latencies, or the whole server's. """
+
+        if game_id == '*':
+            return '* stats games %d %s' % (len(self.games), self.latency.summary())
+
+        return '%s stats %s' % (game_id, self.session(game_id).latency.summary())
+
+    async def handle_close(self, game_id, args):
+        """ End a game and free its board. """
+
+        session = self.session(game_id)
+
+        async with session.lock:
+            del self.games[game_id]
+
+        return '%s closed' % game_id
+
+# Load test
+class LoadTestClient:
+    """ Plays many games of random moves against a server at once and
+        measures round-trip latencies. """
+
+    def __init__(self, games=1000, connections=50, plies=40, seed=None):
+        """ Load test client constructor. """
+
+        self.games = games
+        self.connections = connections
+        self.plies = plies
+        self.generator = random.Random(seed)
+
+        self.latency = LatencyStats()
+        self.finished = 0
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0
+
+    async def run(self, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        """ Play all the games and return the server's own stats line. """
+
+        start = time.perf_counter()
+
+        connections = []
+        for index in range(self.connections):
+            if unix_path:
+                connections += [await asyncio.open_unix_connection(unix_path)]
+            else:
+                connections += [await asyncio.open_connection(host, port)]
+
+        # Replies are routed to the waiting game by id
+        waiting = {}
+        readers = [asyncio.create_task(self.read_replies(reader, waiting)) for reader, writer in connections]
+
+        prefix = '%x' % self.generator.getrandbits(32)
+        await asyncio.gather(*[self.play('%s-%d' % (prefix, game), connections[game % self.connections][1], waiting)
+                               for game in range(self.games)])
+
+        self.seconds = time.perf_counter() - start
+
+        # Ask the server for its view, then hang up
+        writer = connections[0][1]
+        stats = await self.request(writer, waiting, '*', 'stats')
+
+        for reader, writer in connections:
+            writer.close()
+        for task in readers:
+            task.cancel()
+
+        return stats
+
+    async def read_replies(self, reader, waiting):
+        """ Hand each reply line to the game waiting for it. """
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            text = line.decode().strip()
+            game_id = text.split(' ', 1)[0]
+            if game_id in waiting:
+                waiting.pop(game_id).set_result(text)
+
+    async def request(self, writer, waiting, game_id, text):
+        """ Send a request and return the words of its reply. """
+
+        reply = asyncio.get_running_loop().create_future()
+        waiting[game_id] = reply
+
+        start = time.perf_counter()
+        writer.write((text + '\n').encode())
+        words = (await reply).split()
+        self.latency.add(time.perf_counter() - start)
+
+        self.requests += 1
+        if len(words) > 1 and words[1] == 'error':
+            self.errors += 1
+
+        return words
+
+    async def play(self, game_id, writer, waiting):
+        """ Play one game of random moves. """
+
+        await self.request(writer, waiting, game_id, 'new %s' % game_id)
+
+        for ply in range(self.plies):
+            words = await self.request(writer, waiting, game_id, 'moves %s' % game_id)
+            if len(words) < 3:
+                break
+
+            words = await self.request(writer, waiting, game_id, 'move %s %s' % (game_id, self.generator.choice(words[2:])))
+            if words[1] != 'ok' or words[2] != 'ongoing':
+                break
+
+        await self.request(writer, waiting, game_id, 'close %s' % game_id)
+        self.finished += 1
+
+def main(argv=None):
+    """ Command line entry point. """
+
+    parser = argparse.ArgumentParser(description='Host games over a line protocol, or load-test such a server.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='run the server')
+    serve.add_argument('--workers', type=int, default=1, help='search processes (default: 1)')
+    serve.add_argument('--depth', type=int, default=3, help='default search depth of go (default: 3)')
+    serve.add_argument('--max-depth', type=int, default=MAX_DEPTH, help='deepest search go may ask for (default: %d)' % MAX_DEPTH)
+    serve.add_argument('--hash', type=int, default=16, help='transposition table size per search process in MB')
+
+    load = commands.add_parser('load', help='play many random games against a running server')
+    load.add_argument('--games', type=int, default=1000, help='simultaneous games (default: 1000)')
+    load.add_argument('--connections', type=int, default=50, help='connections to spread them over (default: 50)')
+    load.add_argument('--plies', type=int, default=40, help='plies per game (default: 40)')
+    load.add_argument('--seed', type=int, default=None, help='random seed')
+
+    for command in [serve, load]:
+        command.add_argument('--host', default='127.0.0.1', help='TCP host (default: 127.0.0.1)')
+        command.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port (default: %d)' % DEFAULT_PORT)
+        command.add_argument('--unix', help='Unix socket path, instead of TCP')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        server = GameServer(search_workers=args.workers, depth=args.depth, hash_mb=args.hash,
+                            max_depth=args.max_depth)
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return 0
+
+    client = LoadTestClient(args.games, args.connections, args.plies, args.seed)
+    stats = asyncio.run(client.run(args.host, args.port, args.unix))
+
+    print('%d games, %d requests, %d errors, %.2fs (%.0f requests/s)'
+          % (client.finished, client.requests, client.errors, client.seconds, client.requests / max(client.seconds, 1e-9)))
+    print('client round trip: %s' % client.latency.summary())
+    print('server: %s' % ' '.join(stats[2:]))
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
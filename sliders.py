@@ -0,0 +1,91 @@
+import os
+
+from bitboard import *
+
+# Sliding attacks
+# For every square, the attacks of a bishop or rook depend only on which
+# squares along its rays are occupied. Those "relevant" squares exclude
+# the board edge, since a piece on the last square of a ray never blocks
+# anything behind it. Each square gets a table mapping every subset of its
+# relevant squares to the resulting attack bitboard, so a lookup is
+#   TABLE[sq][occupied & MASKS[sq]]
+# The tables hold 102400 rook and 5248 bishop entries. They are built once
+# and cached next to this module so later imports only have to load them.
+
+ROOK_DIRECTIONS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, -1), (-1, 1)]
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sliders.cache')
+
+# Bump when the table layout changes (see load_cached())
+CACHE_VERSION = 1
+
+def relevant_mask(sq, directions):
+    """ Return the squares whose occupancy can change the attacks of a
+        slider on sq moving in the given directions. """
+
+    mask = 0
+
+    for direction in directions:
+        ray = RAYS[direction][sq]
+
+        # Drop the edge square at the far end of the ray
+        if ray:
+            if direction in POSITIVE_DIRECTIONS:
+                ray ^= 1 << msb(ray)
+            else:
+                ray ^= 1 << lsb(ray)
+
+        mask |= ray
+
+    return mask
+
+def build_tables(directions):
+    """ Return the relevant masks and attack tables of every square
+        for a slider moving in the given directions. """
+
+    masks = []
+    tables = []
+
+    for sq in range(64):
+        mask = relevant_mask(sq, directions)
+        table = {}
+
+        # Walk every subset of the mask, starting and ending at the empty set
+        subset = 0
+        while True:
+            attacks = 0
+            for direction in directions:
+                attacks |= ray_attacks(sq, subset, direction)
+            table[subset] = attacks
+
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+
+        masks += [mask]
+        tables += [table]
+
+    return masks, tables
+
+def build_all_tables():
+    """ Return the rook and bishop masks and tables. """
+
+    return build_tables(ROOK_DIRECTIONS) + build_tables(BISHOP_DIRECTIONS)
+
+ROOK_MASKS, ROOK_TABLE, BISHOP_MASKS, BISHOP_TABLE = load_cached(CACHE_PATH, CACHE_VERSION, build_all_tables)
+
+def bishop_attacks(sq, occupied):
+    """ Return the squares a bishop on sq attacks/defends. """
+
+    return BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+
+def rook_attacks(sq, occupied):
+    """ Return the squares a rook on sq attacks/defends. """
+
+    return ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]]
+
+def queen_attacks(sq, occupied):
+    """ Return the squares a queen on sq attacks/defends. """
+
+    return BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]] | ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]]
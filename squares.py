@@ -0,0 +1,61 @@
+import os
+
+from bitboard import *
+
+# Square relations
+# Tables of how every pair of squares relates, indexed [a][b] by square
+# number, so that a question such as "which squares lie between the king
+# and that rook" is one lookup rather than a walk along a ray:
+#   BETWEEN  the squares strictly between a and b on their shared rank,
+#            file, or diagonal; 0 if they share none
+#   LINE     the whole rank, file, or diagonal through a and b, edge to
+#            edge and including both; 0 if they share none
+# The tables are built once and cached next to this module, as the slider
+# tables are (see sliders.py).
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'squares.cache')
+
+# Bump when the table layout changes (see load_cached())
+CACHE_VERSION = 2
+
+def direction_between(a, b):
+    """ Return the (rank, file) step from square a toward square b if they
+        share a rank, file, or diagonal, otherwise None. """
+
+    rank_step = (b >> 3) - (a >> 3)
+    file_step = (b & 7) - (a & 7)
+
+    if a == b or (rank_step and file_step and abs(rank_step) != abs(file_step)):
+        return None
+
+    return (rank_step > 0) - (rank_step < 0), (file_step > 0) - (file_step < 0)
+
+def build_tables():
+    """ Return the between and line tables, each 64 rows of 64 entries. """
+
+    between_table = []
+    line_table = []
+
+    for a in range(64):
+        between_row = []
+        line_row = []
+
+        for b in range(64):
+            direction = direction_between(a, b)
+
+            if direction:
+                opposite = (-direction[0], -direction[1])
+
+                # The ray from a runs through b and on to the edge; cut it at b
+                between_row += [RAYS[direction][a] & ~RAYS[direction][b] & ~(1 << b)]
+                line_row += [RAYS[direction][a] | RAYS[opposite][a] | (1 << a)]
+            else:
+                between_row += [0]
+                line_row += [0]
+
+        between_table += [between_row]
+        line_table += [line_row]
+
+    return between_table, line_table
+
+BETWEEN, LINE = load_cached(CACHE_PATH, CACHE_VERSION, build_tables)
@@ -0,0 +1,135 @@
+from array import array
+
+from board import *
+from pieces import *
+
+# Bound types of a stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Each entry is two 64-bit words: the full position key, then the data
+# word packed as
+#   bits  0-15  best move (see encode_move)
+#   bits 16-23  depth
+#   bits 24-25  bound type
+#   bits 32-63  score + SCORE_OFFSET
+ENTRY_BYTES = 16
+SCORE_OFFSET = 1 << 31
+
+# Entries are grouped in buckets of two: slot 0 keeps the deepest search
+# of the positions that map to the bucket, slot 1 always takes the newest.
+BUCKET_SIZE = 2
+
+def encode_move(move):
+    """ Return the 16 bits of a packed move that identify it in its
+        position: from square, to square, and promotion piece code.
+        The flags are worked out again when the move is generated. """
+
+    if move is None:
+        return 0
+
+    return move & MOVE_MASK
+
+class TranspositionTable:
+    """ Fixed-size hash table of search results keyed by Board.hash. """
+
+    def __init__(self, size_mb=16):
+        """ Transposition table constructor. Memory is allocated up front. """
+
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        """ Reallocate the table to use size_mb megabytes and clear it. """
+
+        self.size_mb = size_mb
+
+        # Round down to a whole number of buckets, at least one
+        buckets = max(1, size_mb * 1024 * 1024 // (ENTRY_BYTES * BUCKET_SIZE))
+        self.buckets = buckets
+        self.entries = buckets * BUCKET_SIZE
+
+        self.keys = array('Q', bytes(8 * self.entries))
+        self.data = array('Q', bytes(8 * self.entries))
+
+        self.reset_stats()
+        self.used = 0
+
+    def clear(self):
+        """ Empty the table. Fresh zeroed arrays are much quicker to make than
+            zeroing the old ones entry by entry. """
+
+        self.keys = array('Q', bytes(8 * self.entries))
+        self.data = array('Q', bytes(8 * self.entries))
+
+        self.reset_stats()
+        self.used = 0
+
+    def reset_stats(self):
+        """ Zero the probe, hit, and store counters. """
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+# Lookup
+    def probe(self, key):
+        """ Return (depth, bound, score, move code) stored for the key, or None. """
+
+        self.probes += 1
+        index = (key % self.buckets) * BUCKET_SIZE
+
+        for slot in range(index, index + BUCKET_SIZE):
+            if self.keys[slot] == key:
+                self.hits += 1
+                data = self.data[slot]
+                return ((data >> 16) & 0xFF,
+                        (data >> 24) & 0x3,
+                        (data >> 32) - SCORE_OFFSET,
+                        data & 0xFFFF)
+
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """ Store a search result. move is a 16-bit move code (see encode_move). """
+
+        self.stores += 1
+        index = (key % self.buckets) * BUCKET_SIZE
+        data = (move & 0xFFFF) | (min(depth, 0xFF) << 16) | (bound << 24) | ((score + SCORE_OFFSET) << 32)
+
+        # Depth-preferred slot: same position, empty, or a shallower search
+        if self.keys[index] == key or self.keys[index] == 0 or depth >= (self.data[index] >> 16) & 0xFF:
+            slot = index
+
+            # An older result for the position in the other slot is now stale
+            # and would only take the room of another position
+            if self.keys[index + 1] == key:
+                self.keys[index + 1] = 0
+                self.data[index + 1] = 0
+                self.used -= 1
+
+        # Always-replace slot for everything else
+        else:
+            slot = index + 1
+
+        if self.keys[slot] == 0:
+            self.used += 1
+
+        self.keys[slot] = key
+        self.data[slot] = data
+
+# Statistics
+    def hit_rate(self):
+        """ Return the fraction of probes that found their position. """
+
+        return self.hits / max(self.probes, 1)
+
+    def fill(self):
+        """ Return the fraction of entries in use. """
+
+        return self.used / self.entries
+
+    def hashfull(self):
+        """ Return the fill in permille, as UCI reports it. """
+
+        return self.used * 1000 // self.entries
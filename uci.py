@@ -0,0 +1,289 @@
+import sys
+import threading
+
+from board import *
+from pieces import *
+from engine import Engine, MATE
+from book import OpeningBook
+from perft import move_name
+from batch import check_position
+
+# UCI
+# The Universal Chess Interface lets chess GUIs and tournament managers
+# drive the engine over stdin and stdout. Commands are read on the main
+# thread; a search runs on a worker thread so that stop, isready and quit
+# are answered while it is going on. The worker reports progress with
+# info lines and ends with a bestmove line.
+#
+# Supported commands: uci, isready, ucinewgame, setoption (Hash, Threads,
+# BookFile), position, go, stop, quit.
+
+ENGINE_NAME = 'pychess'
+ENGINE_AUTHOR = 'pychess authors'
+
+# Options as announced to the GUI: name, type, default, minimum, maximum
+HASH_OPTION = ('Hash', 'spin', 16, 1, 1024)
+THREADS_OPTION = ('Threads', 'spin', 1, 1, 64)
+
+# Time management: plan for this many more moves when the GUI does not say,
+# and keep this much in hand for communication, in milliseconds
+MOVES_TO_GO = 30
+MOVE_OVERHEAD = 50
+
+def allot_time(params, white_to_move):
+    """ Return the time in seconds to spend on a move given the parameters of a
+        go command, or None if the search is not limited by time. """
+
+    if 'movetime' in params:
+        return max(params['movetime'] - MOVE_OVERHEAD, 1) / 1000
+
+    remaining = params.get('wtime' if white_to_move else 'btime')
+    if remaining is None:
+        return None
+
+    increment = params.get('winc' if white_to_move else 'binc', 0)
+    moves_to_go = params.get('movestogo', MOVES_TO_GO)
+
+    budget = remaining / max(moves_to_go, 1) + increment * 3 // 4
+
+    # Never plan to use more than half of what is left
+    budget = min(budget, remaining // 2 - MOVE_OVERHEAD)
+
+    return max(budget, 1) / 1000
+
+def format_score(score):
+    """ Return a search score as UCI reports it: cp <centipawns> or
+        mate <moves>, negative when the side to move is getting mated. """
+
+    if abs(score) >= MATE - 1000:
+        moves = (MATE - abs(score) + 1) // 2
+        return 'mate %d' % (moves if score > 0 else -moves)
+
+    return 'cp %d' % score
+
+class UCIHandler:
+    """ Reads UCI commands and answers them, searching on a worker thread. """
+
+    def __init__(self, output=sys.stdout):
+        """ UCI handler constructor. """
+
+        self.output = output
+        self.output_lock = threading.Lock()
+
+        self.engine = Engine(hash_mb=HASH_OPTION[2])
+        self.engine.on_iteration = self.report
+        self.threads = THREADS_OPTION[2]
+
+        self.board = Board.from_fen(START_FEN)
+
+        # The search in progress, if any
+        self.worker = None
+
+        # Set by stop, and waited on by an infinite search that finishes early,
+        # which must not report its best move until told to stop
+        self.stopped = threading.Event()
+
+        self.handlers = {'uci': self.handle_uci,
+                         'isready': self.handle_isready,
+                         'ucinewgame': self.handle_ucinewgame,
+                         'setoption': self.handle_setoption,
+                         'position': self.handle_position,
+                         'go': self.handle_go,
+                         'stop': self.handle_stop}
+
+    def send(self, line):
+        """ Write one line to the GUI. The worker thread writes too. """
+
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, lines):
+        """ Answer each command line until quit or the end of input. """
+
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+
+            if words[0] == 'quit':
+                break
+
+            if words[0] in self.handlers:
+                # A malformed command is reported and ignored; the GUI would
+                # take the engine dying as a forfeit. Handlers change nothing
+                # until their arguments have been read.
+                try:
+                    self.handlers[words[0]](words[1:])
+                except Exception as error:
+                    self.send('info string cannot run %s: %s' % (line.strip(), str(error) or type(error).__name__))
+            else:
+                self.send('info string unknown command %s' % words[0])
+
+        self.handle_stop([])
+
+# Commands
+    def handle_uci(self, args):
+        """ Identify the engine and list its options. """
+
+        self.send('id name %s' % ENGINE_NAME)
+        self.send('id author %s' % ENGINE_AUTHOR)
+
+        for name, kind, default, minimum, maximum in [HASH_OPTION, THREADS_OPTION]:
+            self.send('option name %s type %s default %d min %d max %d' % (name, kind, default, minimum, maximum))
+        self.send('option name BookFile type string default <empty>')
+
+        self.send('uciok')
+
+    def handle_isready(self, args):
+        """ Answer at once, even while searching. """
+
+        self.send('readyok')
+
+    def handle_ucinewgame(self, args):
+        """ Forget what was learnt about the last game. """
+
+        self.handle_stop([])
+        self.engine.tt.clear()
+
+    def handle_setoption(self, args):
+        """ setoption name <name> [value <value>] """
+
+        if 'name' not in args:
+            return
+
+        if 'value' in args:
+            name = ' '.join(args[args.index('name') + 1:args.index('value')])
+            value = ' '.join(args[args.index('value') + 1:])
+        else:
+            name = ' '.join(args[args.index('name') + 1:])
+            value = ''
+
+        self.handle_stop([])
+
+        if name.lower() == 'hash':
+            size_mb = min(max(int(value), HASH_OPTION[3]), HASH_OPTION[4])
+            self.engine.tt.resize(size_mb)
+
+        elif name.lower() == 'threads':
+            # The search is single-threaded: threads cannot search in
+            # parallel in one Python process, so the setting is only noted
+            self.threads = min(max(int(value), THREADS_OPTION[3]), THREADS_OPTION[4])
+            if self.threads > 1:
+                self.send('info string searching with 1 thread')
+
+        elif name.lower() == 'bookfile':
+            if self.engine.book:
+                self.engine.book.close()
+                self.engine.book = None
+            if value and value != '<empty>':
+                try:
+                    self.engine.book = OpeningBook(value)
+                except OSError as error:
+                    self.send('info string cannot open book %s: %s' % (value, error))
+
+        else:
+            self.send('info string unknown option %s' % name)
+
+    def handle_position(self, args):
+        """ position startpos | fen <fen> [moves <move> ...] """
+
+        self.handle_stop([])
+
+        if 'moves' in args:
+            setup, moves = args[:args.index('moves')], args[args.index('moves') + 1:]
+        else:
+            setup, moves = args, []
+
+        if setup[:1] == ['fen']:
+            board = Board.from_fen(' '.join(setup[1:]))
+        else:
+            board = Board.from_fen(START_FEN)
+
+        check_position(board)
+
+        for name in moves:
+            for move in board.legal_moves(board.white_to_move):
+                if move_name(move) == name:
+                    board.make(move)
+                    break
+            else:
+                self.send('info string illegal move %s' % name)
+                break
+
+        self.board = board
+
+    def handle_go(self, args):
+        """ go [depth <plies>] [nodes <n>] [movetime <ms>] [wtime <ms>] [btime <ms>]
+               [winc <ms>] [binc <ms>] [movestogo <n>] [infinite] """
+
+        params = {}
+        for name, value in zip(args, args[1:]):
+            if name in ['depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo']:
+                params[name] = int(value)
+
+        self.handle_stop([])
+
+        infinite = 'infinite' in args
+
+        engine = self.engine
+        engine.max_depth = params.get('depth', 64)
+        engine.node_limit = params.get('nodes')
+        engine.time_limit = None if infinite else allot_time(params, self.board.white_to_move)
+
+        self.stopped.clear()
+        self.worker = threading.Thread(target=self.search, args=(self.board, infinite), daemon=True)
+        self.worker.start()
+
+    def handle_stop(self, args):
+        """ End the search in progress, if any, once it has reported its best move. """
+
+        if self.worker is None:
+            return
+
+        self.stopped.set()
+
+        # Engine.search() clears the flag as it starts, so keep raising it
+        # until the worker is done
+        while self.worker.is_alive():
+            self.engine.stop_requested = True
+            self.worker.join(0.01)
+
+        self.worker = None
+
+# Search
+    def search(self, board, infinite):
+        """ Search on the worker thread and report the best move. A bestmove
+            line is always sent, since the GUI waits for one. """
+
+        try:
+            best_move, score = self.engine.search(board)
+        except Exception as error:
+            self.send('info string search failed: %s' % (str(error) or type(error).__name__))
+            best_move = None
+
+        if infinite:
+            self.stopped.wait()
+
+        if best_move:
+            self.send('bestmove %s' % move_name(best_move))
+        else:
+            self.send('bestmove 0000')
+
+    def report(self, engine):
+        """ Send an info line for a completed iteration. """
+
+        self.send('info depth %d score %s nodes %d nps %.0f time %d hashfull %d pv %s'
+                  % (engine.depth, format_score(engine.score), engine.nodes, engine.nps(),
+                     engine.seconds * 1000, engine.tt.hashfull(),
+                     ' '.join(move_name(move) for move in engine.pv)))
+
+def main():
+    """ Command line entry point: speak UCI on stdin and stdout. """
+
+    UCIHandler().run(sys.stdin)
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import random
+
+from pieces import *
+
+# Zobrist keys
+# A position's key is the XOR of one random 64-bit number per piece on
+# each square, one for black to move, one per set of castling rights, and
+# one per en passant file. The generator is seeded so keys (and anything
+# stored under them, such as opening books) are the same from run to run.
+
+generator = random.Random(20240917)
+
+# One key per piece class per square
+PIECE_KEYS = {}
+for piece_class in [WhitePawn, WhiteKnight, WhiteBishop, WhiteRook, WhiteQueen, WhiteKing,
+                    BlackPawn, BlackKnight, BlackBishop, BlackRook, BlackQueen, BlackKing]:
+    PIECE_KEYS[piece_class] = [generator.getrandbits(64) for sq in range(64)]
+
+# XORed in whenever black is to move
+SIDE_KEY = generator.getrandbits(64)
+
+# Castling rights are a four-bit mask, see Board.castling_rights()
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+CASTLING_KEYS = [0] + [generator.getrandbits(64) for rights in range(1, 16)]
+
+# One key per file of an en passant capture that is actually available
+EN_PASSANT_KEYS = [generator.getrandbits(64) for file in range(8)]